@@ -4,6 +4,8 @@ from .models import GameState, StateUpdate, UpdateType
 from .state_manager import StateManager
 from .analyzer import ScreenshotAnalyzer
 from .capture import ScreenCapture
+from .pipeline import FramePipeline
+from .profiles import CLAIR_OBSCUR, GameProfile
 
 __all__ = [
     "GameState",
@@ -12,5 +14,8 @@ __all__ = [
     "StateManager",
     "ScreenshotAnalyzer",
     "ScreenCapture",
+    "FramePipeline",
+    "GameProfile",
+    "CLAIR_OBSCUR",
 ]
 
@@ -1,202 +1,713 @@
 """Screenshot analysis using OpenAI's vision model with structured outputs."""
 
+import asyncio
+import base64
+import hashlib
+import json
 import logging
-from openai import OpenAI
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
 
-from .config import MODEL_NAME, get_openai_client
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletion
+from PIL import Image
+from pydantic import BaseModel
+
+from . import preprocess
+from .cache import AnalysisCache, EmbeddingCache, PerceptualCache
+from .config import (
+    ANALYSIS_CACHE_PATH,
+    MODEL_NAME,
+    SEMANTIC_FRAME_CACHE,
+    SEMANTIC_FRAME_CACHE_MODEL,
+    SEMANTIC_FRAME_CACHE_THRESHOLD,
+    UPLOAD_FORMAT,
+    USE_SDK_PARSE,
+    VISION_CACHE_MAX_DISTANCE,
+    VISION_CACHE_PATH,
+    VISION_CACHE_SIZE,
+    get_async_openai_client,
+    get_openai_client,
+)
 from .logging_config import log_openai_request, log_openai_response
-from .models import StateUpdate
+from .models import (
+    BatchedScreenClass,
+    ScreenClass,
+    ScreenType,
+    StateUpdate,
+    UpdateType,
+)
+from .preprocess import MIME_TYPES, Region, decode_image, dhash_image, encode_image
+from .profiles import CLAIR_OBSCUR, GameProfile
+from .schema import precompile
+from .schema import response_format as compiled_response_format
 
 logger = logging.getLogger(__name__)
 
 
-SYSTEM_PROMPT = """<role_and_objective>
-You are a visual analyzer for Clair Obscur: Expedition 33 screenshots, tracking game state in real-time.
-Every detection must be grounded in what is directly observable in the current screenshot.
-Your outputs feed into a game state tracker and voice assistant—accuracy is critical.
-</role_and_objective>
-
-<personality>
-Precise, conservative, and factual. Report only what you can verify visually.
-Honest about uncertainty—flag unclear elements rather than guessing.
-Never infer events between frames; never extrapolate from partial information.
-</personality>
-
-<tone>
-Clinical and efficient. You are a detection system, not a narrator.
-No dramatization or interpretation—just factual observations.
-Use the reasoning field to briefly explain your detection logic.
-</tone>
-
-<game_knowledge>
-Clair Obscur: Expedition 33 is a turn-based RPG set in a dark fantasy Belle Époque world.
-
-Characters: Gustave (party leader, engineering attacks), Maelle (stance switching), Lune (elemental Stains), Sciel (Foretell cards), Verso (Perfection system), Monoco (enemy transformations).
-
-World regions: Lumière, The Continent, Old Lumière, Renoir's Mansion, The Monolith, and areas accessible via Esquie.
-
-Key terms: Gommage (the erasing force), Paintress (antagonist), Axons (ancient powerful beings), Expedition Flags (save/rest points), Pictos (equipable perks), Chroma Catalysts (weapon upgrade materials).
-</game_knowledge>
-
-<detection_categories>
-1. Player Location
-   - Area names displayed when entering new areas
-   - Expedition Flag names visible on screen
-   - Recognizable landmarks or region identifiers
-
-2. Inventory/Equipment
-   - Inventory screens showing items with names and quantities
-   - Pictos menu showing equipable perks
-   - Equipment/weapons screens
-   - Chroma Catalysts (weapon upgrade materials)
-
-3. Boss/Enemy Encounters
-   - Large health bar at the BOTTOM of screen with enemy name above it
-   - Boss names displayed prominently during combat
-   - Estimate HP percentage from bar fill (0-100)
-   - Note if it's an Axon (ancient powerful being)
-
-4. Game Events
-   - Death screen: Party defeated notification
-   - Victory notification: Enemy/Boss defeated
-   - "Expedition Flag Discovered" notification
-
-5. Expedition Flags
-   - Flag rest menu with options: heal party, fast travel, restock items, allocate points
-
-6. Camp
-   - Camp rest screen with relationship/conversation options
-   - Verso can converse with other Expedition members
-
-7. Combat UI
-   - Turn-based battle screen with real-time elements
-   - Action Points (AP) display
-   - Gradient Gauge for powerful attacks
-   - Break/Stamina indicators
-   - Character health bars for party members
-
-8. Player Stats
-   - HP bars for party members
-   - Character level and attributes: Vitality, Might, Agility, Defense, Luck
-   - Lumina Points for passive bonuses
-</detection_categories>
-
-<screen_types>
-Identify the current screen:
-- gameplay: Active world exploration
-- combat: Turn-based battle screen
-- inventory: Inventory/Pictos menu
-- equipment: Equipment/weapons menu
-- map: Continent map view
-- status: Character stats/skill tree
-- camp_menu: Resting at camp
-- flag_menu: At an Expedition Flag
-- loading: Loading screen
-- death_screen: Party defeated
-- cutscene: Cinematic playing
-- dialogue: Character conversation
-</screen_types>
-
-<update_types>
-Select the appropriate update_type:
-- noop: No relevant game state visible or detectable
-- location: New location/area name visible
-- inventory: Inventory/equipment screen with items
-- boss_encounter: Boss/enemy health bar visible in combat
-- game_event: Death, boss defeat, or flag discovery notification
-- flag_rest: Resting at Expedition Flag
-- camp_rest: Resting at camp
-- stats: Player stats visible in HUD/menu
-- multiple: Multiple types of information detected
-</update_types>
-
-<temporal_limitations>
-Screenshots are captured every ~5 seconds. You will miss events between frames.
-
-Critical rules:
-- Report ONLY what is directly observable in the current screenshot
-- Do NOT infer what "must have happened" between screenshots
-- If state seems inconsistent with expectations, note this in uncertainty_notes
-- When you see result screens (death, victory), report the event without assuming cause
-- If location changed unexpectedly, report new location without inferring path
-- Prefer setting fields to null over guessing unobservable values
-</temporal_limitations>
-
-<factual_grounding>
-Every field you populate must be directly visible in the screenshot:
-- If text is partially obscured, report only the visible portion
-- If a value cannot be read clearly, set to null and note in uncertainty_notes
-- If multiple interpretations are possible, choose the most conservative
-- Never fill fields based on what "should" be there from game logic
-</factual_grounding>
-
-<output_guidelines>
-- Be conservative: if unsure, return "noop"
-- Always set screen_type based on visual evidence
-- Include brief reasoning explaining your detection
-- Use uncertainty_notes for discontinuities or unclear elements
-- Populate only fields you can directly verify from the screenshot
-</output_guidelines>"""
+# Screens that never carry structured game state, regardless of triage
+TRIAGE_NOOP_SCREENS = frozenset({ScreenType.LOADING, ScreenType.CUTSCENE})
+
+# Compile the default schemas at import so the first frame doesn't pay for
+# schema generation. Other profiles are compiled by `prompt_version` at init.
+precompile(
+    ScreenClass,
+    BatchedScreenClass,
+    CLAIR_OBSCUR.response_model,
+    CLAIR_OBSCUR.batch_response_model,
+)
 
 
 class ScreenshotAnalyzer:
     """Analyzes game screenshots using GPT vision model."""
     
-    def __init__(self, client: OpenAI | None = None):
+    def __init__(
+        self,
+        profile: GameProfile = CLAIR_OBSCUR,
+        client: OpenAI | None = None,
+        triage: bool = True,
+        frame_cache: PerceptualCache | None = None,
+        semantic_cache: EmbeddingCache | None = None,
+        async_client: AsyncOpenAI | None = None,
+        analysis_cache: AnalysisCache | None = None,
+        image_format: str = UPLOAD_FORMAT,
+    ):
         """Initialize analyzer with OpenAI client.
         
         Args:
+            profile: Game whose prompts and response schema to use.
             client: OpenAI client instance. If None, creates one from config.
+            triage: Classify each frame with a cheap low-detail call first and
+                only run the high-detail analysis when state may be visible.
+            frame_cache: Cache for near-identical frames. If None, creates a
+                persistent one from config, versioned by this profile and model.
+            semantic_cache: Embedding cache for visually different but
+                equivalent frames. If None, created only when enabled in config.
+            async_client: AsyncOpenAI client used by `analyze_async`. If None,
+                created from config on first use.
+            analysis_cache: On-disk cache of exact frames. If None, opens the
+                one from config, versioned by this profile and model.
+            image_format: Format screenshots are re-encoded to for upload
+                (WEBP, JPEG or PNG).
         """
+        if image_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported upload format: {image_format}")
+        
         self.client = client or get_openai_client()
+        self._async_client = async_client
         self.model = MODEL_NAME
+        self.profile = profile
+        self.triage = triage
+        self.image_format = image_format
+        self._data_url_prefix = f"data:{MIME_TYPES[image_format]};base64,"
+        
+        # Built once so every request starts with a byte-identical prefix
+        # (system message, then the instruction text, then images) and
+        # OpenAI's automatic prompt caching can reuse it. Anything dynamic
+        # goes after this prefix.
+        self._system_message = {"role": "system", "content": profile.system_prompt}
+        self._user_text_part = _text_part(profile.user_prompt)
+        self._triage_text_part = _text_part(profile.triage_prompt)
+        version = prompt_version(profile, image_format)
+        self._frame_cache = frame_cache or PerceptualCache(
+            max_entries=VISION_CACHE_SIZE,
+            max_distance=VISION_CACHE_MAX_DISTANCE,
+            path=VISION_CACHE_PATH,
+            prompt_version=version,
+            model=self.model,
+        )
+        if semantic_cache is None and SEMANTIC_FRAME_CACHE:
+            semantic_cache = EmbeddingCache(
+                model_name=SEMANTIC_FRAME_CACHE_MODEL,
+                threshold=SEMANTIC_FRAME_CACHE_THRESHOLD,
+            )
+        self._semantic_cache = semantic_cache if semantic_cache and semantic_cache.enabled else None
+        self._analysis_cache = analysis_cache or AnalysisCache(
+            ANALYSIS_CACHE_PATH,
+            prompt_version=version,
+            model=self.model,
+        )
+        
+        # Decoding, hashing and re-encoding screenshots is CPU-bound; the async
+        # paths run it here so it never stalls the event loop. PIL releases the
+        # GIL in its codecs, so the threads genuinely run in parallel.
+        self._preprocess_pool = ThreadPoolExecutor(
+            max_workers=os.cpu_count(),
+            thread_name_prefix="preprocess",
+        )
     
-    def analyze(self, image_base64: str) -> StateUpdate:
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """AsyncOpenAI client for `analyze_async`, created lazily."""
+        if self._async_client is None:
+            self._async_client = get_async_openai_client()
+        return self._async_client
+    
+    def analyze(self, image_bytes: bytes, previous: StateUpdate | None = None) -> StateUpdate:
         """Analyze a screenshot and return state update.
         
+        Args:
+            image_bytes: Encoded screenshot (e.g. PNG from screen capture)
+            previous: State reported for an earlier frame. When given, the
+                model is asked only for what changed since, and the result is
+                not cached since it depends on this context.
+            
+        Returns:
+            StateUpdate with detected changes or noop
+        """
+        cached, keys, image = self._prepare(image_bytes)
+        if cached is not None:
+            return cached
+        
+        result = None
+        screen_type = None
+        if self.triage:
+            triage_image = self._triage_image(image)
+            screen = self._parse(self._build_messages(self._triage_text_part, [triage_image], detail="low"), ScreenClass)
+            result = self._triage_noop(screen)
+            screen_type = screen.screen_type
+        if result is None:
+            image_base64 = self._high_detail_image(image, screen_type)
+            messages = self._build_messages(self._user_text_part, [image_base64], detail="high", context_part=self._delta_text_part(previous))
+            result = self._parse(messages, self.profile.response_model)
+            if previous is not None:
+                return result
+        
+        self._store_cached(keys, result)
+        return result
+    
+    def analyze_base64(self, image_base64: str) -> StateUpdate:
+        """Analyze a base64-encoded screenshot.
+        
+        Kept for callers that already hold base64 data; prefer `analyze`.
+        
         Args:
             image_base64: Base64-encoded PNG image
             
         Returns:
             StateUpdate with detected changes or noop
         """
-        messages = [
-            {
-                "role": "system",
-                "content": SYSTEM_PROMPT
-            },
+        return self.analyze(base64.b64decode(image_base64))
+    
+    async def analyze_async(self, image_bytes: bytes, previous: StateUpdate | None = None) -> StateUpdate:
+        """Analyze a screenshot without blocking the event loop on the API call.
+        
+        Same behaviour as `analyze`, but requests go through the async client
+        so several frames can be in flight at once, and image processing runs
+        on a thread pool.
+        
+        Args:
+            image_bytes: Encoded screenshot (e.g. PNG from screen capture)
+            previous: State reported for an earlier frame. When given, the
+                model is asked only for what changed since, and the result is
+                not cached since it depends on this context.
+            
+        Returns:
+            StateUpdate with detected changes or noop
+        """
+        cached, keys, image = await self._run_blocking(self._prepare, image_bytes)
+        if cached is not None:
+            return cached
+        
+        result = None
+        screen_type = None
+        if self.triage:
+            triage_image = await self._run_blocking(self._triage_image, image)
+            screen = await self._parse_async(self._build_messages(self._triage_text_part, [triage_image], detail="low"), ScreenClass)
+            result = self._triage_noop(screen)
+            screen_type = screen.screen_type
+        if result is None:
+            image_base64 = await self._run_blocking(self._high_detail_image, image, screen_type)
+            messages = self._build_messages(self._user_text_part, [image_base64], detail="high", context_part=self._delta_text_part(previous))
+            result = await self._parse_async(messages, self.profile.response_model)
+            if previous is not None:
+                return result
+        
+        await self._run_blocking(self._store_cached, keys, result)
+        return result
+    
+    def analyze_many(self, images: list[bytes]) -> list[StateUpdate]:
+        """Analyze several screenshots, sending all cache misses in one request.
+        
+        The HTTP round trip, system prompt prefill and response schema are
+        shared across the batch instead of paid once per frame.
+        
+        Args:
+            images: Encoded screenshots, in capture order
+            
+        Returns:
+            One StateUpdate per image, in the same order
+        """
+        results, pending = self._partition_cached(images)
+        
+        if pending and self.triage:
+            uploads = [self._triage_image(frame.image) for frame in pending]
+            if len(uploads) == 1:
+                screens = [self._parse(self._build_messages(self._triage_text_part, uploads, detail="low"), ScreenClass)]
+            else:
+                prompt = self.profile.batch_triage_prompt.format(count=len(uploads))
+                screens = self._parse(self._build_messages(_text_part(prompt), uploads, detail="low"), BatchedScreenClass).screens
+            pending = self._apply_triage(pending, screens, results)
+        
+        uploads = [self._high_detail_image(frame.image, frame.screen_type) for frame in pending]
+        if len(uploads) == 1:
+            updates = [self._parse(self._build_messages(self._user_text_part, uploads, detail="high"), self.profile.response_model)]
+        elif uploads:
+            prompt = self.profile.batch_user_prompt.format(count=len(uploads))
+            updates = self._parse(self._build_messages(_text_part(prompt), uploads, detail="high"), self.profile.batch_response_model).updates
+            if len(updates) != len(pending):
+                logger.warning(f"Batch returned {len(updates)} updates for {len(pending)} frames, retrying individually")
+                updates = [
+                    self._parse(self._build_messages(self._user_text_part, [upload], detail="high"), self.profile.response_model)
+                    for upload in uploads
+                ]
+        else:
+            updates = []
+        
+        self._finish_batch(pending, updates, results)
+        return results
+    
+    async def analyze_many_async(self, images: list[bytes]) -> list[StateUpdate]:
+        """Async variant of `analyze_many` using the async client.
+        
+        Args:
+            images: Encoded screenshots, in capture order
+            
+        Returns:
+            One StateUpdate per image, in the same order
+        """
+        prepared = await asyncio.gather(*(self._run_blocking(self._prepare, image_bytes) for image_bytes in images))
+        results, pending = self._partition(prepared)
+        
+        if pending and self.triage:
+            uploads = await asyncio.gather(*(self._run_blocking(self._triage_image, frame.image) for frame in pending))
+            if len(uploads) == 1:
+                screens = [await self._parse_async(self._build_messages(self._triage_text_part, uploads, detail="low"), ScreenClass)]
+            else:
+                prompt = self.profile.batch_triage_prompt.format(count=len(uploads))
+                screens = (await self._parse_async(self._build_messages(_text_part(prompt), uploads, detail="low"), BatchedScreenClass)).screens
+            pending = self._apply_triage(pending, screens, results)
+        
+        uploads = await asyncio.gather(*(self._run_blocking(self._high_detail_image, frame.image, frame.screen_type) for frame in pending))
+        if len(uploads) == 1:
+            updates = [await self._parse_async(self._build_messages(self._user_text_part, uploads, detail="high"), self.profile.response_model)]
+        elif uploads:
+            prompt = self.profile.batch_user_prompt.format(count=len(uploads))
+            updates = (await self._parse_async(self._build_messages(_text_part(prompt), uploads, detail="high"), self.profile.batch_response_model)).updates
+            if len(updates) != len(pending):
+                logger.warning(f"Batch returned {len(updates)} updates for {len(pending)} frames, retrying individually")
+                updates = [
+                    await self._parse_async(self._build_messages(self._user_text_part, [upload], detail="high"), self.profile.response_model)
+                    for upload in uploads
+                ]
+        else:
+            updates = []
+        
+        await self._run_blocking(self._finish_batch, pending, updates, results)
+        return results
+    
+    def _partition_cached(self, images: list[bytes]) -> tuple[list[StateUpdate | None], list["_PendingFrame"]]:
+        """Resolve cached frames of a batch and decode the rest.
+        
+        Args:
+            images: Encoded screenshots
+            
+        Returns:
+            Tuple of (results with None for misses, frames still to analyze)
+        """
+        return self._partition([self._prepare(image_bytes) for image_bytes in images])
+    
+    def _partition(
+        self,
+        prepared: list[tuple[StateUpdate | None, "_FrameKeys", Image.Image | None]],
+    ) -> tuple[list[StateUpdate | None], list["_PendingFrame"]]:
+        """Split prepared batch frames into cache hits and frames to analyze.
+        
+        Args:
+            prepared: `_prepare` result per screenshot
+            
+        Returns:
+            Tuple of (results with None for misses, frames still to analyze)
+        """
+        results: list[StateUpdate | None] = [None] * len(prepared)
+        pending: list[_PendingFrame] = []
+        for index, (cached, keys, image) in enumerate(prepared):
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending.append(_PendingFrame(index, keys, image))
+        return results, pending
+    
+    def _apply_triage(
+        self,
+        pending: list["_PendingFrame"],
+        screens: list[ScreenClass],
+        results: list[StateUpdate | None],
+    ) -> list["_PendingFrame"]:
+        """Resolve frames that triage marks as noop.
+        
+        Remaining frames are tagged with their screen type, which selects
+        their high-detail upload variant.
+        
+        Args:
+            pending: Frames awaiting analysis
+            screens: Triage result per pending frame
+            results: Batch results, filled in for skipped frames
+            
+        Returns:
+            Frames that still need the high-detail analysis
+        """
+        if len(screens) != len(pending):
+            logger.warning(f"Triage returned {len(screens)} results for {len(pending)} frames, analyzing all")
+            return pending
+        
+        remaining = []
+        for frame, screen in zip(pending, screens):
+            noop = self._triage_noop(screen)
+            if noop is None:
+                remaining.append(frame._replace(screen_type=screen.screen_type))
+            else:
+                results[frame.index] = noop
+                self._store_cached(frame.keys, noop)
+        return remaining
+    
+    def _finish_batch(
+        self,
+        pending: list["_PendingFrame"],
+        updates: list[StateUpdate],
+        results: list[StateUpdate | None],
+    ) -> None:
+        """Record analyzed batch frames in the results and frame caches."""
+        for frame, update in zip(pending, updates):
+            results[frame.index] = update
+            self._store_cached(frame.keys, update)
+    
+    def _prepare(self, image_bytes: bytes) -> tuple[StateUpdate | None, "_FrameKeys", Image.Image | None]:
+        """Decode a frame once and check the caches with it.
+        
+        Args:
+            image_bytes: Encoded source image
+            
+        Returns:
+            Tuple of (cached result or None, cache keys, decoded image or None
+            on a hit). Every upload variant is encoded from the decoded image.
+        """
+        image = decode_image(image_bytes)
+        cached, keys = self._lookup_cached(image_bytes, image)
+        if cached is not None:
+            return cached, keys, None
+        return None, keys, image
+    
+    async def _run_blocking(self, func: Callable, *args):
+        """Run CPU-bound image work on the preprocessing pool."""
+        return await asyncio.get_running_loop().run_in_executor(self._preprocess_pool, func, *args)
+    
+    def _lookup_cached(self, image_bytes: bytes, image: Image.Image) -> tuple[StateUpdate | None, "_FrameKeys"]:
+        """Check the caches for a previously analyzed equivalent frame.
+        
+        Caches are tried cheapest first: perceptual hash, then the exact-match
+        disk cache, then (if enabled) the CLIP embedding cache. A hit in a
+        slower cache is promoted into the in-memory frame cache.
+        
+        Args:
+            image_bytes: Encoded source image
+            image: The same image, decoded
+            
+        Returns:
+            Tuple of (cached result or None, cache keys). The keys are reused
+            to store the result on a miss.
+        """
+        image_hash = dhash_image(image)
+        cached = self._frame_cache.lookup(image_hash)
+        if cached is not None:
+            logger.debug(f"Frame cache hit: {image_hash:016x}")
+            return cached, _FrameKeys(image_hash, None, None)
+        
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        cached = self._analysis_cache.lookup(digest)
+        if cached is not None:
+            logger.debug(f"Analysis cache hit: {digest[:12]}")
+            self._frame_cache.store(image_hash, cached)
+            return cached, _FrameKeys(image_hash, digest, None)
+        
+        embedding = None
+        if self._semantic_cache:
+            embedding = self._semantic_cache.embed(image)
+            cached = self._semantic_cache.lookup(embedding)
+            if cached is not None:
+                logger.debug("Semantic frame cache hit")
+                self._frame_cache.store(image_hash, cached)
+        
+        return cached, _FrameKeys(image_hash, digest, embedding)
+    
+    def _store_cached(self, keys: "_FrameKeys", result: StateUpdate) -> None:
+        """Record a fresh analysis result in the caches."""
+        self._frame_cache.store(keys.image_hash, result)
+        if keys.digest is not None:
+            self._analysis_cache.store(keys.digest, result)
+        if keys.embedding is not None:
+            self._semantic_cache.store(keys.embedding, result)
+    
+    def _triage_noop(self, screen: ScreenClass) -> StateUpdate | None:
+        """Turn a triage result into a noop update if the frame can be skipped.
+        
+        Args:
+            screen: Result of the low-detail classification
+            
+        Returns:
+            A noop StateUpdate, or None if the frame needs full analysis
+        """
+        if screen.screen_type not in TRIAGE_NOOP_SCREENS and screen.has_state_info:
+            return None
+        
+        logger.debug(f"Triage skipped high-detail analysis: {screen.screen_type.value}")
+        # Built from already-validated triage output, so skip re-validation
+        return StateUpdate.model_construct(
+            update_type=UpdateType.NOOP,
+            screen_type=screen.screen_type,
+            reasoning=f"Low-detail triage found no game state on {screen.screen_type.value} screen.",
+        )
+    
+    def _parse(self, messages: list[dict], response_format: type[BaseModel]) -> BaseModel:
+        """Send a structured-output request and return the parsed result.
+        
+        Args:
+            messages: Chat messages to send
+            response_format: Pydantic model the response must conform to
+            
+        Returns:
+            Parsed response model
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            log_openai_request(logger, self.model, messages, response_format)
+        
+        if USE_SDK_PARSE:
+            response = self.client.beta.chat.completions.parse(
+                model=self.model,
+                messages=messages,
+                response_format=response_format,
+            )
+            parsed_result = response.choices[0].message.parsed
+        else:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                response_format=compiled_response_format(response_format),
+            )
+            parsed_result = _validate_response(response, response_format)
+        
+        if debug:
+            log_openai_response(logger, response, parsed_result)
+        
+        return parsed_result
+    
+    async def _parse_async(self, messages: list[dict], response_format: type[BaseModel]) -> BaseModel:
+        """Async variant of `_parse` using the async client."""
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            log_openai_request(logger, self.model, messages, response_format)
+        
+        if USE_SDK_PARSE:
+            response = await self.async_client.beta.chat.completions.parse(
+                model=self.model,
+                messages=messages,
+                response_format=response_format,
+            )
+            parsed_result = response.choices[0].message.parsed
+        else:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                response_format=compiled_response_format(response_format),
+            )
+            parsed_result = _validate_response(response, response_format)
+        
+        if debug:
+            log_openai_response(logger, response, parsed_result)
+        
+        return parsed_result
+    
+    def _build_messages(
+        self,
+        text_part: dict,
+        images_base64: list[str],
+        detail: str,
+        context_part: dict | None = None,
+    ) -> list[dict]:
+        """Build the chat messages for a screenshot request.
+        
+        Args:
+            text_part: User instruction content part, sent before the images
+            images_base64: Base64-encoded preprocessed images, in order
+            detail: Vision detail level ("low" or "high")
+            context_part: Optional per-frame text, sent after the static
+                instruction so the cacheable prefix is unchanged
+            
+        Returns:
+            Messages list for the chat completions API
+        """
+        return [
+            self._system_message,
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "text",
-                        "text": "Analyze this Clair Obscur: Expedition 33 screenshot and determine if there's any game state to update."
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{image_base64}",
-                            "detail": "high"
+                    text_part,
+                    *([context_part] if context_part else []),
+                    *(
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": self._data_url_prefix + image_base64,
+                                "detail": detail
+                            }
                         }
-                    }
+                        for image_base64 in images_base64
+                    ),
                 ]
             }
         ]
+    
+    def _delta_text_part(self, previous: StateUpdate | None) -> dict | None:
+        """Build the context part describing the previously reported state.
         
-        # Log the request
-        log_openai_request(logger, self.model, messages, StateUpdate)
+        Args:
+            previous: State reported for an earlier frame, if any
+            
+        Returns:
+            Text content part, or None when there is no previous state
+        """
+        if previous is None:
+            return None
+        summary = previous.model_dump_json(exclude_none=True, exclude={"reasoning", "uncertainty_notes"})
+        return _text_part(self.profile.delta_prompt.format(previous=summary))
+    
+    def _triage_image(self, image: Image.Image) -> str:
+        """Encode the small upload for the low-detail triage request."""
+        return self._encode(image, low_detail=True)
+    
+    def _high_detail_image(self, image: Image.Image, screen_type: ScreenType | None) -> str:
+        """Encode the high-detail upload for a frame.
         
-        logger.debug(f"Sending request to OpenAI model: {self.model}")
+        Text-only screens are sent in grayscale and HUD screens are cropped
+        to the profile's regions of interest. Without triage (screen_type
+        None) the full frame is sent.
         
-        response = self.client.beta.chat.completions.parse(
-            model=self.model,
-            messages=messages,
-            response_format=StateUpdate,
-        )
+        Args:
+            image: Decoded source image
+            screen_type: Screen type reported by triage, if any
+            
+        Returns:
+            Base64-encoded image for the high-detail request
+        """
+        grayscale = screen_type in self.profile.grayscale_screens
+        regions = self.profile.crop_regions.get(screen_type)
+        return self._encode(image, grayscale, regions)
+    
+    def _encode(
+        self,
+        image: Image.Image,
+        grayscale: bool = False,
+        regions: tuple[Region, ...] | None = None,
+        low_detail: bool = False,
+    ) -> str:
+        """Encode an upload variant of a decoded screenshot.
         
-        parsed_result = response.choices[0].message.parsed
+        This is the only place uploads are base64-encoded.
         
-        # Log the response
-        log_openai_response(logger, response, parsed_result)
+        Args:
+            image: Decoded source image
+            grayscale: Drop colour for text-only screens
+            regions: HUD regions to crop to
+            low_detail: Size for the low-detail triage request
+            
+        Returns:
+            Base64-encoded image in the configured upload format
+        """
+        encoded = encode_image(image, self.image_format, grayscale, regions, low_detail)
+        logger.debug(f"Encoded {'low' if low_detail else 'high'}-detail upload: {image.size} -> {len(encoded)} bytes")
+        return base64.b64encode(encoded).decode("ascii")
+
+
+def _text_part(text: str) -> dict:
+    """Build a text content part for a dynamic instruction."""
+    return {"type": "text", "text": text}
+
+
+def _validate_response(response: ChatCompletion, response_format: type[BaseModel]) -> BaseModel:
+    """Validate a structured-output completion against its response model.
+    
+    Args:
+        response: Completion requested with a JSON-schema response format
+        response_format: Pydantic model the content must conform to
         
-        return parsed_result
+    Returns:
+        Parsed response model
+    """
+    message = response.choices[0].message
+    if message.content is None:
+        raise ValueError(f"Model returned no structured output: {message.refusal or 'empty response'}")
+    return response_format.model_validate_json(message.content)
+
+
+def prompt_version(profile: GameProfile, image_format: str = UPLOAD_FORMAT) -> str:
+    """Fingerprint everything that shapes a request besides the screenshot.
+    
+    Used to version on-disk cached results, so editing a prompt, the response
+    model, the per-screen image treatment or the upload preprocessing
+    invalidates them.
+    
+    Args:
+        profile: Game profile in use
+        image_format: Format screenshots are re-encoded to for upload
+        
+    Returns:
+        Short hex digest
+    """
+    payload = json.dumps(
+        [
+            profile.system_prompt,
+            profile.user_prompt,
+            profile.triage_prompt,
+            profile.batch_user_prompt,
+            profile.batch_triage_prompt,
+            profile.delta_prompt,
+            compiled_response_format(profile.response_model),
+            compiled_response_format(profile.batch_response_model),
+            compiled_response_format(ScreenClass),
+            compiled_response_format(BatchedScreenClass),
+            sorted(screen.value for screen in profile.grayscale_screens),
+            sorted((screen.value, regions) for screen, regions in profile.crop_regions.items()),
+            image_format,
+            [
+                preprocess.TILE_SIZE,
+                preprocess.MAX_LONG_EDGE,
+                preprocess.MAX_SHORT_EDGE,
+                preprocess.MIN_SNAP_SCALE,
+                preprocess.LOW_DETAIL_SIZE,
+                preprocess.JPEG_QUALITY,
+                preprocess.WEBP_QUALITY,
+                preprocess.WEBP_METHOD,
+            ],
+        ],
+        sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:8]
+
+
+class _FrameKeys(NamedTuple):
+    """Keys identifying a frame in each cache."""
+    image_hash: int
+    digest: str | None
+    embedding: np.ndarray | None
+
+
+class _PendingFrame(NamedTuple):
+    """A batch frame that missed the caches and still needs analysis."""
+    index: int
+    keys: _FrameKeys
+    image: Image.Image
+    screen_type: ScreenType | None = None
@@ -0,0 +1,336 @@
+"""Caches that let the analyzer skip vision calls for repeated frames."""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from .models import StateUpdate
+from .preprocess import nearest_hash
+
+logger = logging.getLogger(__name__)
+
+
+class PerceptualCache:
+    """LRU cache of analysis results keyed by perceptual image hash.
+
+    Consecutive screenshots are often pixel-identical or nearly so (idle
+    player, open menu, loading screen). A frame whose hash is within
+    `max_distance` bits of a recently analyzed frame reuses that result.
+    Safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 32,
+        max_distance: int = 4,
+        path: str | Path | None = None,
+        prompt_version: str | None = None,
+        model: str | None = None,
+    ):
+        """Initialize the cache, loading persisted entries if available.
+
+        Args:
+            max_entries: Number of recent frames to keep.
+            max_distance: Maximum Hamming distance that counts as a match.
+            path: Optional JSON file to persist entries across runs.
+            prompt_version: Fingerprint of the prompts and schemas in use. A
+                persisted file written under another version is discarded.
+            model: Model name the results were produced with; a persisted file
+                from another model is discarded.
+        """
+        self._max_entries = max_entries
+        self._max_distance = max_distance
+        self._path = Path(path) if path else None
+        self._prompt_version = prompt_version
+        self._model = model
+
+        # Preallocated so the Hamming scan is one kernel call over an array
+        self._hashes = np.zeros(max_entries, dtype=np.uint64)
+        self._updates: list[StateUpdate | None] = [None] * max_entries
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._count = 0
+        self._tick = 0
+        self._lock = threading.Lock()
+
+        if self._path and self._path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def lookup(self, image_hash: int) -> StateUpdate | None:
+        """Find the result for a visually near-identical frame.
+
+        Args:
+            image_hash: Perceptual hash of the incoming frame.
+
+        Returns:
+            The cached StateUpdate, or None if no recent frame is close enough.
+        """
+        with self._lock:
+            index, distance = nearest_hash(image_hash, self._hashes[: self._count])
+            if index < 0 or distance > self._max_distance:
+                return None
+
+            self._touch(index)
+            return self._updates[index]
+
+    def store(self, image_hash: int, update: StateUpdate, persist: bool = True) -> None:
+        """Cache the analysis result for a frame.
+
+        Args:
+            image_hash: Perceptual hash of the analyzed frame.
+            update: The result returned by the model.
+            persist: Write the cache file after storing.
+        """
+        with self._lock:
+            matches = np.flatnonzero(self._hashes[: self._count] == np.uint64(image_hash))
+            if matches.size:
+                index = int(matches[0])
+            elif self._count < self._max_entries:
+                index = self._count
+                self._count += 1
+            else:
+                index = int(np.argmin(self._last_used))
+
+            self._hashes[index] = image_hash
+            self._updates[index] = update
+            self._touch(index)
+
+            if self._path and persist:
+                self._save()
+
+    def _touch(self, index: int) -> None:
+        """Mark an entry as most recently used."""
+        self._tick += 1
+        self._last_used[index] = self._tick
+
+    def _load(self) -> None:
+        """Load persisted entries, ignoring a corrupt or outdated file."""
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+            if (
+                not isinstance(data, dict)
+                or data.get("prompt_version") != self._prompt_version
+                or data.get("model") != self._model
+            ):
+                logger.info(f"Discarding vision cache {self._path} from another prompt version or model")
+                return
+            for record in data["entries"][-self._max_entries:]:
+                self.store(record["hash"], StateUpdate.model_validate(record["update"]), persist=False)
+            logger.info(f"Loaded {self._count} cached frames from {self._path}")
+        except (OSError, ValueError, KeyError, OverflowError) as e:
+            logger.warning(f"Ignoring unreadable vision cache {self._path}: {e}")
+            self._updates = [None] * self._max_entries
+            self._count = 0
+
+    def _save(self) -> None:
+        """Persist entries atomically so a crash never leaves a partial file."""
+        # Least recently used first, matching the order `_load` replays them in
+        order = np.argsort(self._last_used[: self._count])
+        records = [
+            {"hash": int(self._hashes[index]), "update": self._updates[index].model_dump(mode="json")}
+            for index in order
+        ]
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_suffix(".tmp")
+        data = {"prompt_version": self._prompt_version, "model": self._model, "entries": records}
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        tmp_path.replace(self._path)
+
+
+class EmbeddingCache:
+    """Semantic cache of analysis results keyed by CLIP image embedding.
+
+    Catches frames that differ pixel-wise but show the same thing (the same
+    menu in a different area, an unchanged HUD over moving scenery). Requires
+    the optional `sentence-transformers` package; without it the cache stays
+    disabled and every lookup misses. Safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "clip-ViT-B-32",
+        max_entries: int = 512,
+        threshold: float = 0.97,
+    ):
+        """Initialize the cache and load the embedding model.
+
+        Args:
+            model_name: sentence-transformers image model to embed frames with.
+            max_entries: Number of embeddings to keep before evicting the least
+                recently used.
+            threshold: Minimum cosine similarity that counts as a match.
+        """
+        self._max_entries = max_entries
+        self._threshold = threshold
+        self._model = None
+        self._enabled = False
+
+        # Preallocated [max_entries, dim] matrix, sized on first embedding
+        self._embeddings: np.ndarray | None = None
+        self._updates: list[StateUpdate | None] = [None] * max_entries
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._count = 0
+        self._tick = 0
+        self._lock = threading.Lock()
+
+        try:
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(model_name)
+            self._enabled = True
+            logger.info(f"Semantic frame cache enabled with {model_name}")
+        except ImportError:
+            logger.warning("sentence-transformers not installed. Semantic frame cache disabled.")
+        except Exception as e:
+            # e.g. a failed model download; the agent runs on without this layer
+            logger.warning(f"Failed to load {model_name}. Semantic frame cache disabled: {e}")
+
+    @property
+    def enabled(self) -> bool:
+        """Check if the embedding model is available."""
+        return self._enabled
+
+    def embed(self, img: Image.Image) -> np.ndarray:
+        """Embed a screenshot into an L2-normalised vector.
+
+        Args:
+            img: Decoded RGB screenshot.
+
+        Returns:
+            float32 embedding vector.
+        """
+        vector = self._model.encode(img, convert_to_numpy=True, normalize_embeddings=True)
+        return vector.astype(np.float32, copy=False)
+
+    def lookup(self, embedding: np.ndarray) -> StateUpdate | None:
+        """Find the result for a semantically identical frame.
+
+        Args:
+            embedding: Normalised embedding of the incoming frame.
+
+        Returns:
+            The cached StateUpdate, or None if nothing is similar enough.
+        """
+        with self._lock:
+            if self._count == 0:
+                return None
+
+            # Vectors are normalised, so one matrix-vector product gives cosines
+            similarities = self._embeddings[: self._count] @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self._threshold:
+                return None
+
+            self._touch(best)
+            return self._updates[best]
+
+    def store(self, embedding: np.ndarray, update: StateUpdate) -> None:
+        """Cache the analysis result for a frame.
+
+        Args:
+            embedding: Normalised embedding of the analyzed frame.
+            update: The result returned by the model.
+        """
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = np.empty((self._max_entries, embedding.shape[0]), dtype=np.float32)
+
+            if self._count < self._max_entries:
+                index = self._count
+                self._count += 1
+            else:
+                index = int(np.argmin(self._last_used))
+
+            self._embeddings[index] = embedding
+            self._updates[index] = update
+            self._touch(index)
+
+    def _touch(self, index: int) -> None:
+        """Mark an entry as most recently used."""
+        self._tick += 1
+        self._last_used[index] = self._tick
+
+
+class AnalysisCache:
+    """Disk-backed cache of analysis results keyed by exact image content.
+
+    Re-running over the same screenshots (replays, prompt regression runs,
+    resuming after a crash) returns stored results instead of re-billing
+    identical frames. Entries are also keyed by prompt version and model, so
+    editing a prompt or switching models invalidates them. Safe to use from
+    several threads.
+    """
+
+    def __init__(self, path: str | Path, prompt_version: str, model: str):
+        """Open (or create) the cache database.
+
+        Args:
+            path: SQLite database file.
+            prompt_version: Fingerprint of the prompts and schemas in use.
+            model: Model name the results were produced with.
+        """
+        self._path = Path(path)
+        self._prompt_version = prompt_version
+        self._model = model
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self._path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analyses (
+                input_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response_json TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                PRIMARY KEY (input_hash, prompt_version, model)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def lookup(self, input_hash: str) -> StateUpdate | None:
+        """Find a stored result for an identical frame.
+
+        Args:
+            input_hash: SHA-256 hex digest of the source image bytes.
+
+        Returns:
+            The cached StateUpdate, or None on a miss.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response_json FROM analyses WHERE input_hash = ? AND prompt_version = ? AND model = ?",
+                (input_hash, self._prompt_version, self._model),
+            ).fetchone()
+        if row is None:
+            return None
+        return StateUpdate.model_validate_json(row[0])
+
+    def store(self, input_hash: str, update: StateUpdate) -> None:
+        """Write through a fresh analysis result.
+
+        Args:
+            input_hash: SHA-256 hex digest of the source image bytes.
+            update: The result returned by the model.
+        """
+        response_json = update.model_dump_json()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?)",
+                (input_hash, self._prompt_version, self._model, response_json, int(time.time())),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
@@ -27,11 +27,11 @@ class ScreenCapture:
             self._sct.close()
             self._sct = None
     
-    def capture_base64(self) -> str:
-        """Capture screenshot and return as base64-encoded PNG.
+    def capture_png(self) -> bytes:
+        """Capture screenshot and return it as PNG bytes.
         
         Returns:
-            Base64-encoded PNG image string suitable for OpenAI API
+            PNG-encoded screenshot
         """
         if self._sct is None:
             raise RuntimeError("ScreenCapture must be used as context manager")
@@ -40,10 +40,15 @@ class ScreenCapture:
         screenshot = self._sct.grab(self._sct.monitors[self.monitor])
         
         # Convert to PNG bytes
-        png_bytes = self._to_png(screenshot)
+        return self._to_png(screenshot)
+    
+    def capture_base64(self) -> str:
+        """Capture screenshot and return as base64-encoded PNG.
         
-        # Encode to base64
-        return base64.b64encode(png_bytes).decode("utf-8")
+        Returns:
+            Base64-encoded PNG image string suitable for OpenAI API
+        """
+        return base64.b64encode(self.capture_png()).decode("utf-8")
     
     def _to_png(self, screenshot) -> bytes:
         """Convert mss screenshot to PNG bytes."""
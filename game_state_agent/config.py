@@ -1,8 +1,13 @@
 """Configuration and OpenAI client setup."""
 
 import os
+from functools import cache
+
+import httpx
 from dotenv import find_dotenv, load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from .transport import AsyncOrjsonClient, OrjsonClient
 
 # Load environment variables from root .env file
 load_dotenv(find_dotenv())
@@ -11,9 +16,46 @@ load_dotenv(find_dotenv())
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL_NAME = "gpt-5.1-2025-11-13"
 
+# Shared HTTP connection pool. With HTTP/2 concurrent requests multiplex over
+# one connection instead of each paying for its own TLS handshake.
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# Use the SDK's beta parse helper instead of the precompiled response schema
+USE_SDK_PARSE = os.getenv("USE_SDK_PARSE", "false").lower() == "true"
+
+# Upload format for screenshots: WEBP (smallest), JPEG, or PNG (lossless fallback)
+UPLOAD_FORMAT = os.getenv("UPLOAD_FORMAT", "WEBP").upper()
+
 # Screenshot interval in seconds
 CAPTURE_INTERVAL = 2
 
+# Concurrent in-flight analysis requests and frames buffered ahead of them
+INFERENCE_WORKERS = 4
+FRAME_QUEUE_SIZE = 8
+
+# Frames that queue up while workers are busy are coalesced into one request
+BATCH_MAX_FRAMES = 4
+BATCH_TIMEOUT = 0.5
+
+# Send the last reported state with each frame and ask only for what changed.
+# Off by default: delta results depend on that context, so they bypass the
+# frame caches, and the pipeline runs frames one at a time to keep it current.
+DELTA_PROMPTING = os.getenv("DELTA_PROMPTING", "false").lower() == "true"
+
+# Perceptual-hash frame cache (skips vision calls for near-identical frames)
+VISION_CACHE_PATH = "data/vision_cache.json"
+VISION_CACHE_SIZE = 32
+VISION_CACHE_MAX_DISTANCE = 4
+
+# On-disk cache of exact frames, so replays and re-runs are not re-billed
+ANALYSIS_CACHE_PATH = "data/analyzer_cache.db"
+
+# Semantic frame cache using a local CLIP model (needs the vision-cache extra)
+SEMANTIC_FRAME_CACHE = os.getenv("SEMANTIC_FRAME_CACHE", "false").lower() == "true"
+SEMANTIC_FRAME_CACHE_MODEL = "clip-ViT-B-32"
+SEMANTIC_FRAME_CACHE_THRESHOLD = 0.97
+
 # Redis configuration (loaded from .env via existing load_dotenv call)
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
@@ -21,8 +63,19 @@ REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
 GAME_STATE_KEY = "game:state:latest"
 
 
+@cache
 def get_openai_client() -> OpenAI:
-    """Get configured OpenAI client."""
+    """Get the shared OpenAI client (HTTP/2, tuned connection pool)."""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+    http_client = OrjsonClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return OpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+
+
+@cache
+def get_async_openai_client() -> AsyncOpenAI:
+    """Get the shared async OpenAI client (HTTP/2, tuned connection pool)."""
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY environment variable not set")
-    return OpenAI(api_key=OPENAI_API_KEY)
+    http_client = AsyncOrjsonClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
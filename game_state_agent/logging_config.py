@@ -2,6 +2,7 @@
 
 import logging
 import json
+import textwrap
 from datetime import datetime
 from pathlib import Path
 
@@ -60,17 +61,39 @@ def setup_logging(log_dir: str = "logs") -> Path:
     return log_file
 
 
+def _redact_content_part(item: dict) -> str:
+    """Summarize a multimodal content part without copying image data."""
+    if item.get("type") == "text":
+        return f"text: {item.get('text', '')}"
+    if item.get("type") == "image_url":
+        image_url = item.get("image_url", {})
+        url = image_url.get("url", "")
+        return f"image: <base64 {len(url)} B, detail={image_url.get('detail', 'auto')}>"
+    return f"{item.get('type', 'unknown')}: [omitted]"
+
+
 def log_openai_request(logger: logging.Logger, model: str, messages: list, response_format: type | None = None) -> None:
     """Log an OpenAI API request (concise version).
     
+    Image parts are summarized by size only, so the base64 payload is never
+    copied or serialized. Does nothing unless DEBUG is enabled for `logger`;
+    hot-path callers should still check `logger.isEnabledFor(logging.DEBUG)`
+    first to skip the call entirely.
+    
     Args:
         logger: Logger instance to use
         model: Model name being used
         messages: Messages being sent to the API
         response_format: The response format type if using structured outputs
     """
-    # Extract just the essential info from messages
-    message_summary = []
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    
+    logger.debug(
+        "OpenAI Request -> model=%s, response_format=%s",
+        model,
+        response_format.__name__ if response_format else None,
+    )
     for msg in messages:
         role = msg.get("role", "unknown")
         content = msg.get("content", "")
@@ -78,66 +101,72 @@ def log_openai_request(logger: logging.Logger, model: str, messages: list, respo
         if isinstance(content, str):
             # System or simple user message - truncate if too long
             preview = content[:200] + "..." if len(content) > 200 else content
-            message_summary.append({"role": role, "content": preview})
         elif isinstance(content, list):
-            # Multimodal message (text + image)
-            parts = []
-            for item in content:
-                if item.get("type") == "text":
-                    parts.append(f"text: {item.get('text', '')}")
-                elif item.get("type") == "image_url":
-                    parts.append("image: [screenshot]")
-            message_summary.append({"role": role, "content": " | ".join(parts)})
-    
-    logger.debug(f"OpenAI Request -> model={model}, response_format={response_format.__name__ if response_format else None}")
-    for msg in message_summary:
-        logger.debug(f"  [{msg['role']}] {msg['content']}")
+            # Multimodal message (text + images)
+            preview = " | ".join(_redact_content_part(item) for item in content)
+        else:
+            preview = "[omitted]"
+        logger.debug("  [%s] %s", role, preview)
 
 
 def log_openai_response(logger: logging.Logger, response: object, parsed_result: object | None = None) -> None:
     """Log an OpenAI API response (concise version).
     
+    Does nothing unless DEBUG is enabled for `logger`.
+    
     Args:
         logger: Logger instance to use
         response: Raw response from OpenAI
         parsed_result: Parsed structured output if applicable
     """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    
     # Log usage stats
     usage = getattr(response, "usage", None)
     if usage:
         logger.debug(
-            f"OpenAI Response -> tokens: {usage.prompt_tokens} prompt + "
-            f"{usage.completion_tokens} completion = {usage.total_tokens} total"
+            "OpenAI Response -> tokens: %s prompt + %s completion = %s total",
+            usage.prompt_tokens,
+            usage.completion_tokens,
+            usage.total_tokens,
         )
     
     # Log parsed result
-    if parsed_result and hasattr(parsed_result, "model_dump"):
-        result_dict = parsed_result.model_dump()
-        logger.debug(f"Parsed result: {json.dumps(result_dict, default=str)}")
+    if parsed_result and hasattr(parsed_result, "model_dump_json"):
+        logger.debug("Parsed result: %s", parsed_result.model_dump_json())
+
+
+def _to_json(obj: object) -> str:
+    """Serialize a model straight to indented JSON, without a Python dict round trip."""
+    if hasattr(obj, "model_dump_json"):
+        return obj.model_dump_json(indent=2)
+    return json.dumps(str(obj))
 
 
 def log_game_state(logger: logging.Logger, state: object, update: object | None = None) -> None:
     """Log the current game state.
     
+    Runs on every analyzed frame, so models are serialized by Pydantic's
+    native JSON encoder and the log entry is assembled as text.
+    
     Args:
         logger: Logger instance to use
         state: Current GameState object
         update: The StateUpdate that was applied (if any)
     """
-    if hasattr(state, "model_dump"):
-        state_dict = state.model_dump()
-    else:
-        state_dict = str(state)
-    
-    log_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "game_state": state_dict
-    }
+    if not logger.isEnabledFor(logging.INFO):
+        return
     
+    fields = {
+        "timestamp": json.dumps(datetime.now().isoformat()),
+        "game_state": _to_json(state),
+    }
     if update:
-        if hasattr(update, "model_dump"):
-            log_entry["applied_update"] = update.model_dump()
-        else:
-            log_entry["applied_update"] = str(update)
+        fields["applied_update"] = _to_json(update)
     
-    logger.info(f"Game State Update:\n{json.dumps(log_entry, indent=2, default=str)}")
+    body = ",\n".join(
+        f'  "{key}": {textwrap.indent(value, "  ").lstrip()}'
+        for key, value in fields.items()
+    )
+    logger.info("Game State Update:\n{\n%s\n}", body)
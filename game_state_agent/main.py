@@ -1,13 +1,20 @@
 """Main entry point for the game state agent."""
 
+import asyncio
 import logging
 import signal
-import time
 
 from .analyzer import ScreenshotAnalyzer
-from .capture import ScreenCapture
-from .config import CAPTURE_INTERVAL
+from .config import (
+    BATCH_MAX_FRAMES,
+    BATCH_TIMEOUT,
+    CAPTURE_INTERVAL,
+    DELTA_PROMPTING,
+    FRAME_QUEUE_SIZE,
+    INFERENCE_WORKERS,
+)
 from .logging_config import setup_logging
+from .pipeline import FramePipeline
 from .redis_store import GameStateStore
 from .state_manager import StateManager
 
@@ -17,16 +24,31 @@ logger = logging.getLogger(__name__)
 class GameStateAgent:
     """Main agent that coordinates screenshot capture and analysis."""
 
-    def __init__(self, capture_interval: float = CAPTURE_INTERVAL):
+    def __init__(
+        self,
+        capture_interval: float = CAPTURE_INTERVAL,
+        workers: int = INFERENCE_WORKERS,
+    ):
         """Initialize the game state agent.
 
         Args:
             capture_interval: Seconds between screenshot captures
+            workers: Maximum number of concurrent analysis requests
         """
         self.capture_interval = capture_interval
         self.redis_store = GameStateStore()
         self.state_manager = StateManager(redis_store=self.redis_store)
         self.analyzer = ScreenshotAnalyzer()
+        self.pipeline = FramePipeline(
+            analyzer=self.analyzer,
+            state_manager=self.state_manager,
+            capture_interval=capture_interval,
+            workers=workers,
+            queue_size=FRAME_QUEUE_SIZE,
+            batch_size=BATCH_MAX_FRAMES,
+            batch_timeout=BATCH_TIMEOUT,
+            delta=DELTA_PROMPTING,
+        )
         self._running = False
     
     def start(self) -> None:
@@ -41,55 +63,19 @@ class GameStateAgent:
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
         
-        with ScreenCapture() as capture:
-            while self._running:
-                try:
-                    self._process_frame(capture)
-                except Exception as e:
-                    logger.error(f"Error processing frame: {e}", exc_info=True)
-                
-                # Wait for next capture interval
-                if self._running:
-                    time.sleep(self.capture_interval)
+        asyncio.run(self.pipeline.run())
         
         logger.info("Game State Agent stopped")
     
     def stop(self) -> None:
         """Stop the game state tracking loop."""
         self._running = False
+        self.pipeline.stop()
     
     def _signal_handler(self, signum, frame) -> None:
         """Handle shutdown signals gracefully."""
         logger.info("\nShutdown signal received...")
         self.stop()
-    
-    def _process_frame(self, capture: ScreenCapture) -> None:
-        """Capture and analyze a single frame."""
-        start_time = time.time()
-        
-        # Capture screenshot
-        logger.debug("Capturing screenshot...")
-        image_base64 = capture.capture_base64()
-        capture_time = time.time() - start_time
-        logger.debug(f"Screenshot captured in {capture_time:.3f}s")
-        
-        # Analyze with LLM
-        logger.debug("Analyzing screenshot with LLM...")
-        analysis_start = time.time()
-        update = self.analyzer.analyze(image_base64)
-        analysis_time = time.time() - analysis_start
-        logger.debug(f"Analysis completed in {analysis_time:.3f}s")
-        
-        # Process update
-        changed = self.state_manager.process_update(update)
-        
-        # Log timing and state
-        total_time = time.time() - start_time
-        logger.info(
-            f"Frame processed in {total_time:.2f}s "
-            f"(capture: {capture_time:.2f}s, analysis: {analysis_time:.2f}s) "
-            f"- {'STATE CHANGED' if changed else 'no change'}"
-        )
 
 
 def main():
@@ -1,8 +1,11 @@
 """Pydantic models for game state and LLM structured outputs."""
 
+import dataclasses
+from collections.abc import Callable
 from enum import Enum
-from typing import Optional
-from pydantic import BaseModel, Field
+
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+from pydantic.dataclasses import dataclass
 
 
 class GameEvent(str, Enum):
@@ -13,6 +16,14 @@ class GameEvent(str, Enum):
     FLAG_DISCOVERED = "flag_discovered"     # "Expedition Flag Discovered"
 
 
+# Members compared on every frame, bound once so the hot path does plain
+# global lookups instead of class attribute resolution through EnumType
+_EVENT_NONE = GameEvent.NONE
+_PARTY_DEFEATED = GameEvent.PARTY_DEFEATED
+_BOSS_DEFEATED = GameEvent.BOSS_DEFEATED
+_FLAG_DISCOVERED = GameEvent.FLAG_DISCOVERED
+
+
 class ScreenType(str, Enum):
     """Type of screen currently displayed."""
     GAMEPLAY = "gameplay"
@@ -42,42 +53,71 @@ class UpdateType(str, Enum):
     MULTIPLE = "multiple"
 
 
-class InventoryItem(BaseModel):
+_NOOP = UpdateType.NOOP
+_MULTIPLE = UpdateType.MULTIPLE
+
+
+# Leaf value objects are frozen, slotted pydantic dataclasses: the LLM can
+# return dozens per frame and they need no per-instance __dict__.
+@dataclass(frozen=True, slots=True)
+class InventoryItem:
     """An item in the player's inventory."""
-    name: str = Field(description="Name of the item")
+    name: str = Field(description="Name of the item, including Chroma Catalysts (weapon upgrade materials)")
     quantity: int = Field(default=1, description="Quantity of the item")
 
 
-class Picto(BaseModel):
+@dataclass(frozen=True, slots=True)
+class Picto:
     """A Picto (equipable perk) in the game."""
     name: str = Field(description="Name of the Picto")
-    character: Optional[str] = Field(default=None, description="Character the Picto is equipped to")
+    character: str | None = Field(default=None, description="Character the Picto is equipped to")
     mastered: bool = Field(default=False, description="Whether the Picto has been mastered")
 
 
-class BossState(BaseModel):
+@dataclass(frozen=True, slots=True)
+class BossState:
     """Boss/enemy encounter information."""
-    name: str = Field(description="Boss/enemy name from health bar")
-    hp_percentage: float = Field(description="Estimated HP remaining (0-100)")
+    name: str = Field(description="Boss/enemy name shown above the large health bar at the bottom of the screen")
+    hp_percentage: float = Field(description="Estimated HP remaining (0-100) from the health bar fill")
     is_axon: bool = Field(default=False, description="Whether this is an Axon (ancient powerful being)")
 
 
-class CharacterStats(BaseModel):
+@dataclass(frozen=True, slots=True)
+class CharacterStats:
     """Stats for a party member."""
     name: str = Field(description="Character name (Gustave, Maelle, Lune, Sciel, Verso, Monoco)")
-    hp_percentage: Optional[float] = Field(default=None, description="Estimated HP (0-100)")
-    level: Optional[int] = Field(default=None, description="Character level if visible")
-    vitality: Optional[int] = Field(default=None, description="Vitality stat (max health)")
-    might: Optional[int] = Field(default=None, description="Might stat (attack power)")
-    agility: Optional[int] = Field(default=None, description="Agility stat (attack frequency)")
-    defense: Optional[int] = Field(default=None, description="Defense stat (damage reduction)")
-    luck: Optional[int] = Field(default=None, description="Luck stat (critical rate)")
+    hp_percentage: float | None = Field(default=None, description="Estimated HP (0-100)")
+    level: int | None = Field(default=None, description="Character level if visible")
+    vitality: int | None = Field(default=None, description="Vitality stat (max health)")
+    might: int | None = Field(default=None, description="Might stat (attack power)")
+    agility: int | None = Field(default=None, description="Agility stat (attack frequency)")
+    defense: int | None = Field(default=None, description="Defense stat (damage reduction)")
+    luck: int | None = Field(default=None, description="Luck stat (critical rate)")
+
+
+# CharacterStats fields patched in place by _apply_stats (everything but name)
+_CHARACTER_STAT_FIELDS = ("hp_percentage", "level", "vitality", "might", "agility", "defense", "luck")
 
 
-class PartyStats(BaseModel):
+@dataclass(frozen=True, slots=True)
+class PartyStats:
     """Party-wide stats visible in HUD or menus."""
-    active_characters: Optional[list[str]] = Field(default=None, description="Characters currently in the active party")
-    gradient_gauge: Optional[float] = Field(default=None, description="Gradient gauge percentage (0-100) for powerful attacks")
+    active_characters: list[str] | None = Field(default=None, description="Characters currently in the active party")
+    gradient_gauge: float | None = Field(default=None, description="Gradient gauge percentage (0-100) for powerful attacks")
+
+
+class ScreenClass(BaseModel):
+    """Cheap low-detail triage of a screenshot.
+    
+    Used to skip the full high-detail analysis for frames that cannot
+    carry any game state (loading screens, cutscenes, plain exploration).
+    """
+    screen_type: ScreenType = Field(
+        description="Type of screen currently displayed (gameplay, combat, inventory, map, etc.)"
+    )
+    has_state_info: bool = Field(
+        description="Whether any trackable game state is visible: an area or Expedition Flag name, a notification (death, victory, flag discovered), a boss health bar, an inventory/Pictos/equipment list, or party stats."
+    )
 
 
 class StateUpdate(BaseModel):
@@ -87,59 +127,95 @@ class StateUpdate(BaseModel):
     consistent parsing of the LLM's analysis.
     """
     update_type: UpdateType = Field(
-        description="Type of update detected. Use 'noop' if no relevant game state information is visible."
+        description=(
+            "Type of update detected. noop: no relevant game state visible; "
+            "location: area name or landmark shown on entering an area; "
+            "inventory: inventory, Pictos or equipment screen with items; "
+            "boss_encounter: boss/enemy health bar visible in combat; "
+            "game_event: death, boss defeat, or 'Expedition Flag Discovered' notification; "
+            "flag_rest: Expedition Flag rest menu (heal, fast travel, restock, allocate points); "
+            "camp_rest: camp rest screen with relationship/conversation options; "
+            "stats: party HP bars, levels or attributes in HUD or menus; "
+            "multiple: more than one of the above."
+        )
     )
     screen_type: ScreenType = Field(
         default=ScreenType.GAMEPLAY,
-        description="Type of screen currently displayed (gameplay, combat, inventory, map, etc.)"
+        description=(
+            "Type of screen currently displayed. gameplay: world exploration; "
+            "combat: turn-based battle with AP, Gradient Gauge and party health bars; "
+            "inventory: inventory/Pictos menu; equipment: equipment/weapons menu; "
+            "map: Continent map; status: character stats/skill tree; "
+            "camp_menu: resting at camp; flag_menu: at an Expedition Flag; "
+            "loading: loading screen; death_screen: party defeated; "
+            "cutscene: cinematic; dialogue: character conversation."
+        )
     )
-    new_location: Optional[str] = Field(
+    new_location: str | None = Field(
         default=None,
-        description="The player's current location/area name if visible (e.g., 'Lumière', 'The Continent', 'Old Lumière', 'Renoir's Mansion'). Set when update_type is 'location' or 'multiple'."
+        description="The player's current location/area name or Expedition Flag area if visible (e.g., 'Lumière', 'The Continent', 'Old Lumière', 'Renoir's Mansion', 'The Monolith'). Set when update_type is 'location' or 'multiple'."
     )
-    inventory_items: Optional[list[InventoryItem]] = Field(
+    inventory_items: list[InventoryItem] | None = Field(
         default=None,
         description="List of items visible in the inventory screen. Only set if update_type is 'inventory' or 'multiple' and an inventory/equipment screen is clearly visible."
     )
-    pictos: Optional[list[Picto]] = Field(
+    pictos: list[Picto] | None = Field(
         default=None,
         description="List of Pictos (equipable perks) visible. Only set if viewing Picto menu."
     )
-    game_event: Optional[GameEvent] = Field(
+    game_event: GameEvent | None = Field(
         default=None,
         description="Major game event if visible (death screen, boss defeated, flag discovered). Set when update_type is 'game_event' or 'multiple'."
     )
-    boss: Optional[BossState] = Field(
+    boss: BossState | None = Field(
         default=None,
         description="Boss/enemy encounter info if a boss health bar is visible in combat. Set when update_type is 'boss_encounter' or 'multiple'."
     )
-    flag_name: Optional[str] = Field(
+    flag_name: str | None = Field(
         default=None,
         description="Name of Expedition Flag if player is resting at one. Set when update_type is 'flag_rest' or 'multiple'."
     )
-    at_camp: Optional[bool] = Field(
+    at_camp: bool | None = Field(
         default=None,
         description="Whether the party is resting at camp. Set when update_type is 'camp_rest' or 'multiple'."
     )
-    character_stats: Optional[list[CharacterStats]] = Field(
+    character_stats: list[CharacterStats] | None = Field(
         default=None,
         description="Stats for party members visible in HUD or menus."
     )
-    party_stats: Optional[PartyStats] = Field(
+    party_stats: PartyStats | None = Field(
         default=None,
         description="Party-wide stats like gradient gauge."
     )
     reasoning: str = Field(
         description="Brief explanation of what was detected in the screenshot and why this update type was chosen."
     )
-    uncertainty_notes: Optional[str] = Field(
+    uncertainty_notes: str | None = Field(
         default=None,
         description="Note any apparent discontinuities or uncertainty about state transitions (e.g., boss health bar disappeared unexpectedly)."
     )
 
 
+class BatchedScreenClass(BaseModel):
+    """Low-detail triage of several screenshots in one request."""
+    screens: list[ScreenClass] = Field(
+        description="One classification per screenshot, in the order the screenshots were given."
+    )
+
+
+class BatchedStateUpdate(BaseModel):
+    """Structured output for several screenshots analyzed in one request."""
+    updates: list[StateUpdate] = Field(
+        description="One update per screenshot, in the order the screenshots were given. Analyze each screenshot independently."
+    )
+
+
 class GameState(BaseModel):
     """Current state of the game being tracked."""
+    # apply_update assigns already-validated StateUpdate data on every frame;
+    # keep assignment validation off so those writes stay plain setattrs
+    model_config = ConfigDict(validate_assignment=False)
+    
     player_location: str = Field(
         default="Unknown",
         description="Current area/region the party is in"
@@ -152,11 +228,11 @@ class GameState(BaseModel):
         default_factory=list,
         description="Pictos collected by the party"
     )
-    current_boss: Optional[BossState] = Field(
+    current_boss: BossState | None = Field(
         default=None,
         description="Current boss being fought, if any"
     )
-    last_flag: Optional[str] = Field(
+    last_flag: str | None = Field(
         default=None,
         description="Last Expedition Flag the party rested at"
     )
@@ -193,82 +269,148 @@ class GameState(BaseModel):
         description="Current gradient gauge percentage"
     )
     
+    # Set indices for the append-only name lists, so membership checks stay
+    # constant-time however long the session runs. Not serialized.
+    _bosses_set: set[str] = PrivateAttr(default_factory=set)
+    _axons_set: set[str] = PrivateAttr(default_factory=set)
+    _flags_set: set[str] = PrivateAttr(default_factory=set)
+    
+    def model_post_init(self, context: object) -> None:
+        """Rebuild the membership indices from the lists."""
+        self._bosses_set = set(self.bosses_defeated)
+        self._axons_set = set(self.axons_defeated)
+        self._flags_set = set(self.flags_discovered)
+    
     def apply_update(self, update: StateUpdate) -> bool:
         """Apply a state update and return True if state changed."""
-        if update.update_type == UpdateType.NOOP:
+        update_type = update.update_type
+        if update_type is _NOOP:
             return False
         
-        changed = False
+        if update_type is _MULTIPLE:
+            # Run every handler (no short-circuit), in declaration order
+            return any([handler(self, update) for handler in _HANDLERS.values()])
         
-        # Location updates
-        if update.update_type in (UpdateType.LOCATION, UpdateType.MULTIPLE):
-            if update.new_location and update.new_location != self.player_location:
-                self.player_location = update.new_location
-                changed = True
-        
-        # Inventory updates
-        if update.update_type in (UpdateType.INVENTORY, UpdateType.MULTIPLE):
-            if update.inventory_items is not None:
-                self.inventory = update.inventory_items
-                changed = True
-            if update.pictos is not None:
-                self.pictos = update.pictos
-                changed = True
-        
-        # Boss encounter updates
-        if update.update_type in (UpdateType.BOSS_ENCOUNTER, UpdateType.MULTIPLE):
-            if update.boss is not None:
-                self.current_boss = update.boss
-                changed = True
-        
-        # Game event updates
-        if update.update_type in (UpdateType.GAME_EVENT, UpdateType.MULTIPLE):
-            if update.game_event is not None and update.game_event != GameEvent.NONE:
-                if update.game_event == GameEvent.PARTY_DEFEATED:
-                    self.party_defeats += 1
-                    self.current_boss = None  # Clear boss state on defeat
-                    changed = True
-                elif update.game_event == GameEvent.BOSS_DEFEATED:
-                    if self.current_boss is not None:
-                        if self.current_boss.name not in self.bosses_defeated:
-                            self.bosses_defeated.append(self.current_boss.name)
-                        if self.current_boss.is_axon and self.current_boss.name not in self.axons_defeated:
-                            self.axons_defeated.append(self.current_boss.name)
-                        self.current_boss = None
-                    changed = True
-                elif update.game_event == GameEvent.FLAG_DISCOVERED:
-                    if update.flag_name and update.flag_name not in self.flags_discovered:
-                        self.flags_discovered.append(update.flag_name)
-                    changed = True
-        
-        # Flag rest updates
-        if update.update_type in (UpdateType.FLAG_REST, UpdateType.MULTIPLE):
-            if update.flag_name:
-                self.last_flag = update.flag_name
-                if update.flag_name not in self.flags_discovered:
-                    self.flags_discovered.append(update.flag_name)
-                self.current_boss = None  # Clear boss state when resting
-                self.at_camp = False
-                changed = True
-        
-        # Camp rest updates
-        if update.update_type in (UpdateType.CAMP_REST, UpdateType.MULTIPLE):
-            if update.at_camp is not None:
-                self.at_camp = update.at_camp
-                self.current_boss = None  # Clear boss state when at camp
-                changed = True
-        
-        # Stats updates
-        if update.update_type in (UpdateType.STATS, UpdateType.MULTIPLE):
-            if update.character_stats is not None:
-                for char_stat in update.character_stats:
-                    self.character_stats[char_stat.name] = char_stat
-                changed = True
-            if update.party_stats is not None:
-                if update.party_stats.active_characters:
-                    self.active_party = update.party_stats.active_characters
-                if update.party_stats.gradient_gauge is not None:
-                    self.gradient_gauge = update.party_stats.gradient_gauge
-                changed = True
-        
-        return changed
+        handler = _HANDLERS.get(update_type)
+        return handler(self, update) if handler else False
+
+
+def _apply_location(state: GameState, update: StateUpdate) -> bool:
+    """Apply a location change."""
+    if update.new_location and update.new_location != state.player_location:
+        state.player_location = update.new_location
+        return True
+    return False
+
+
+def _apply_inventory(state: GameState, update: StateUpdate) -> bool:
+    """Replace inventory items and/or pictos."""
+    changed = False
+    if update.inventory_items is not None:
+        state.inventory = update.inventory_items
+        changed = True
+    if update.pictos is not None:
+        state.pictos = update.pictos
+        changed = True
+    return changed
+
+
+def _apply_boss_encounter(state: GameState, update: StateUpdate) -> bool:
+    """Track the boss currently being fought."""
+    if update.boss is not None:
+        state.current_boss = update.boss
+        return True
+    return False
+
+
+def _apply_game_event(state: GameState, update: StateUpdate) -> bool:
+    """Apply a major game event (defeat, boss kill, flag discovery)."""
+    event = update.game_event
+    if event is None or event is _EVENT_NONE:
+        return False
+    
+    if event is _PARTY_DEFEATED:
+        state.party_defeats += 1
+        state.current_boss = None  # Clear boss state on defeat
+    elif event is _BOSS_DEFEATED:
+        boss = state.current_boss
+        if boss is not None:
+            if boss.name not in state._bosses_set:
+                state.bosses_defeated.append(boss.name)
+                state._bosses_set.add(boss.name)
+            if boss.is_axon and boss.name not in state._axons_set:
+                state.axons_defeated.append(boss.name)
+                state._axons_set.add(boss.name)
+            state.current_boss = None
+    elif event is _FLAG_DISCOVERED:
+        if update.flag_name and update.flag_name not in state._flags_set:
+            state.flags_discovered.append(update.flag_name)
+            state._flags_set.add(update.flag_name)
+    return True
+
+
+def _apply_flag_rest(state: GameState, update: StateUpdate) -> bool:
+    """Record a rest at an Expedition Flag."""
+    if not update.flag_name:
+        return False
+    state.last_flag = update.flag_name
+    if update.flag_name not in state._flags_set:
+        state.flags_discovered.append(update.flag_name)
+        state._flags_set.add(update.flag_name)
+    state.current_boss = None  # Clear boss state when resting
+    state.at_camp = False
+    return True
+
+
+def _apply_camp_rest(state: GameState, update: StateUpdate) -> bool:
+    """Record entering or leaving camp."""
+    if update.at_camp is None:
+        return False
+    state.at_camp = update.at_camp
+    state.current_boss = None  # Clear boss state when at camp
+    return True
+
+
+def _apply_stats(state: GameState, update: StateUpdate) -> bool:
+    """Update per-character stats and party-wide stats."""
+    changed = False
+    if update.character_stats is not None:
+        for char_stat in update.character_stats:
+            existing = state.character_stats.get(char_stat.name)
+            if existing is None:
+                # Frozen, so sharing the update's instance is safe
+                state.character_stats[char_stat.name] = char_stat
+                continue
+            # Replace with a copy carrying only the fields this frame reported
+            patch = {
+                field: value
+                for field in _CHARACTER_STAT_FIELDS
+                if (value := getattr(char_stat, field)) is not None
+            }
+            if patch:
+                state.character_stats[char_stat.name] = dataclasses.replace(existing, **patch)
+        changed = True
+    party_stats = update.party_stats
+    if party_stats is not None:
+        diff = {}
+        if party_stats.active_characters:
+            diff["active_party"] = party_stats.active_characters
+        if party_stats.gradient_gauge is not None:
+            diff["gradient_gauge"] = party_stats.gradient_gauge
+        # setattr keeps model_fields_set (and so exclude_unset) accurate
+        for field, value in diff.items():
+            setattr(state, field, value)
+        changed = True
+    return changed
+
+
+# Handler per single-domain update type; MULTIPLE runs all of them in this order
+_HANDLERS: dict[UpdateType, Callable[[GameState, StateUpdate], bool]] = {
+    UpdateType.LOCATION: _apply_location,
+    UpdateType.INVENTORY: _apply_inventory,
+    UpdateType.BOSS_ENCOUNTER: _apply_boss_encounter,
+    UpdateType.GAME_EVENT: _apply_game_event,
+    UpdateType.FLAG_REST: _apply_flag_rest,
+    UpdateType.CAMP_REST: _apply_camp_rest,
+    UpdateType.STATS: _apply_stats,
+}
@@ -0,0 +1,209 @@
+"""Asynchronous capture -> analysis -> state update pipeline."""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .analyzer import ScreenshotAnalyzer
+from .capture import ScreenCapture
+from .models import StateUpdate, UpdateType
+from .state_manager import StateManager
+
+logger = logging.getLogger(__name__)
+
+
+class FramePipeline:
+    """Runs capture, inference and state updates as decoupled asyncio stages.
+
+    Capture keeps its cadence regardless of API latency, several analysis
+    requests can be in flight at once, and results are applied to the state
+    manager strictly in capture order via a reorder buffer.
+    """
+
+    def __init__(
+        self,
+        analyzer: ScreenshotAnalyzer,
+        state_manager: StateManager,
+        capture_interval: float,
+        workers: int = 4,
+        queue_size: int = 8,
+        batch_size: int = 4,
+        batch_timeout: float = 0.5,
+        monitor: int = 1,
+        delta: bool = False,
+    ):
+        """Initialize the pipeline.
+
+        Args:
+            analyzer: Analyzer used to turn frames into state updates.
+            state_manager: Receives updates in capture order.
+            capture_interval: Seconds between screenshot captures.
+            workers: Maximum number of concurrent analysis requests.
+            queue_size: Frames buffered ahead of the workers. When full, new
+                captures are skipped rather than stalling the capture loop.
+            batch_size: Maximum frames coalesced into one analysis request.
+            batch_timeout: Seconds a worker waits for more frames to arrive
+                before sending a partial batch.
+            monitor: Monitor number to capture (1 = primary monitor).
+            delta: Send the last reported state with each request so the model
+                only reports what changed. Frames are then analyzed one at a
+                time by a single worker, so each request sees the state
+                reported for the frame before it.
+        """
+        self._analyzer = analyzer
+        self._state_manager = state_manager
+        self._capture_interval = capture_interval
+        self._workers = 1 if delta else workers
+        self._queue_size = queue_size
+        self._batch_size = 1 if delta else batch_size
+        self._batch_timeout = batch_timeout
+        self._monitor = monitor
+        self._delta = delta
+        self._previous: StateUpdate | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopped: asyncio.Event | None = None
+
+    async def run(self) -> None:
+        """Run the pipeline until `stop` is called, then drain in-flight frames."""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+
+        frames: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        results: asyncio.Queue = asyncio.Queue()
+
+        workers = [
+            asyncio.create_task(self._inference_worker(frames, results))
+            for _ in range(self._workers)
+        ]
+        sink = asyncio.create_task(self._sink(results))
+
+        try:
+            await self._capture_stage(frames)
+        finally:
+            # Let workers finish queued frames, then close the sink
+            for _ in workers:
+                await frames.put(None)
+            await asyncio.gather(*workers)
+            await results.put(None)
+            await sink
+
+    def stop(self) -> None:
+        """Request shutdown. Safe to call from signal handlers or other threads."""
+        if self._loop and self._stopped:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _capture_stage(self, frames: asyncio.Queue) -> None:
+        """Capture screenshots at a fixed cadence and enqueue them."""
+        # mss handles are thread-bound, so capture always runs on one thread
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+        capture = ScreenCapture(monitor=self._monitor)
+        sequence = 0
+
+        try:
+            await self._loop.run_in_executor(executor, capture.__enter__)
+            while not self._stopped.is_set():
+                started = time.time()
+
+                if frames.full():
+                    logger.warning("Analysis backlog full, skipping frame")
+                else:
+                    try:
+                        image_bytes = await self._loop.run_in_executor(executor, capture.capture_png)
+                    except Exception as e:
+                        # A failed grab only costs this frame; keep the cadence
+                        logger.error(f"Error capturing frame: {e}", exc_info=True)
+                    else:
+                        frames.put_nowait((sequence, image_bytes, started))
+                        logger.debug(f"Captured frame {sequence} in {time.time() - started:.3f}s")
+                        sequence += 1
+
+                delay = max(0.0, self._capture_interval - (time.time() - started))
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=delay)
+                except TimeoutError:
+                    pass
+        finally:
+            await self._loop.run_in_executor(executor, capture.__exit__, None, None, None)
+            executor.shutdown()
+
+    async def _inference_worker(self, frames: asyncio.Queue, results: asyncio.Queue) -> None:
+        """Analyze queued frames in coalesced batches until a None sentinel is received."""
+        finished = False
+        while not finished:
+            item = await frames.get()
+            if item is None:
+                return
+
+            # Coalesce frames that arrive while this worker is starting a request
+            batch = [item]
+            deadline = time.monotonic() + self._batch_timeout
+            while len(batch) < self._batch_size:
+                try:
+                    item = await asyncio.wait_for(frames.get(), timeout=max(0.0, deadline - time.monotonic()))
+                except TimeoutError:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+
+            analysis_start = time.time()
+            updates: list[StateUpdate | None] = [None] * len(batch)
+            try:
+                if len(batch) == 1:
+                    previous = self._previous if self._delta else None
+                    updates = [await self._analyzer.analyze_async(batch[0][1], previous=previous)]
+                    # With delta the only worker folds the update in before it
+                    # takes the next frame, so `_previous` is never stale
+                    if self._delta and updates[0].update_type != UpdateType.NOOP:
+                        self._previous = _merge_reported(self._previous, updates[0])
+                else:
+                    updates = await self._analyzer.analyze_many_async([image for _, image, _ in batch])
+            except Exception as e:
+                logger.error(f"Error analyzing frames {[seq for seq, _, _ in batch]}: {e}", exc_info=True)
+            analysis_time = time.time() - analysis_start
+
+            for (sequence, _, captured_at), update in zip(batch, updates):
+                await results.put((sequence, update, captured_at, analysis_time))
+
+    async def _sink(self, results: asyncio.Queue) -> None:
+        """Apply results to the state manager in capture order."""
+        pending: dict[int, tuple] = {}
+        next_sequence = 0
+
+        while (item := await results.get()) is not None:
+            pending[item[0]] = item
+            while next_sequence in pending:
+                _, update, captured_at, analysis_time = pending.pop(next_sequence)
+                if update is not None:
+                    changed = self._state_manager.process_update(update)
+                    logger.info(
+                        f"Frame {next_sequence} processed in {time.time() - captured_at:.2f}s "
+                        f"(analysis: {analysis_time:.2f}s) "
+                        f"- {'STATE CHANGED' if changed else 'no change'}"
+                    )
+                next_sequence += 1
+
+
+def _merge_reported(previous: StateUpdate | None, update: StateUpdate) -> StateUpdate:
+    """Fold an update into the running picture of what has been reported.
+    
+    Delta responses leave unchanged fields null, so the latest non-null value
+    of each field is kept. Game events are momentary and never carried over,
+    otherwise a repeat of the same event would look unchanged.
+    
+    Args:
+        previous: Merged state reported so far, if any
+        update: Newly applied update
+        
+    Returns:
+        Merged StateUpdate
+    """
+    changes = {
+        name: getattr(update, name)
+        for name in update.model_fields_set
+        if getattr(update, name) is not None
+    }
+    changes["game_event"] = None
+    return (previous or update).model_copy(update=changes)
@@ -0,0 +1,261 @@
+"""Screenshot preprocessing to reduce vision token usage and upload size."""
+
+import io
+import logging
+import math
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# OpenAI high-detail vision bills images in 512x512 tiles after scaling them
+# to fit a 2048x2048 square with the shortest side at most 768px.
+TILE_SIZE = 512
+MAX_LONG_EDGE = 2048
+MAX_SHORT_EDGE = 768
+
+# Only snap down to a smaller tile grid if it keeps at least this much of the
+# resolution, so HUD text stays legible.
+MIN_SNAP_SCALE = 0.85
+
+# Low-detail requests are billed a flat rate and downscaled to 512x512
+# server-side, so the triage upload never needs more pixels than that.
+LOW_DETAIL_SIZE = 512
+
+JPEG_QUALITY = 80
+WEBP_QUALITY = 80
+WEBP_METHOD = 4
+
+# Fractional (left, top, right, bottom) box within a frame
+Region = tuple[float, float, float, float]
+
+# Upload formats the vision API accepts, with their data URL MIME types
+MIME_TYPES = {
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+}
+
+
+def count_tiles(width: int, height: int) -> int:
+    """Count the 512px vision tiles an image of the given size is billed for.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        Number of tiles
+    """
+    return math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+def fit_to_tile_grid(width: int, height: int) -> tuple[int, int]:
+    """Compute the upload size for an image, snapped to the vision tile grid.
+
+    Applies the same downscaling OpenAI does server-side (so the upload carries
+    no pixels the model would discard), then shrinks slightly further if that
+    lands the image on a smaller tile grid without losing legibility.
+
+    Args:
+        width: Source image width in pixels
+        height: Source image height in pixels
+
+    Returns:
+        Target (width, height), never larger than the source
+    """
+    scale = min(
+        1.0,
+        MAX_LONG_EDGE / max(width, height),
+        MAX_SHORT_EDGE / min(width, height),
+    )
+    target_w, target_h = width * scale, height * scale
+
+    # Try snapping each edge down to the tile boundary below it and keep
+    # whichever candidate yields the fewest tiles within the legibility limit.
+    best = (round(target_w), round(target_h))
+    best_tiles = count_tiles(*best)
+    for edge in (target_w, target_h):
+        boundary = (math.ceil(edge / TILE_SIZE) - 1) * TILE_SIZE
+        if boundary <= 0:
+            continue
+        snap = boundary / edge
+        if snap < MIN_SNAP_SCALE:
+            continue
+        candidate = (int(target_w * snap), int(target_h * snap))
+        tiles = count_tiles(*candidate)
+        if tiles < best_tiles:
+            best, best_tiles = candidate, tiles
+
+    return best
+
+
+def crop_regions(img: Image.Image, regions: tuple[Region, ...]) -> Image.Image:
+    """Cut regions out of a frame and stack them into one composite image.
+
+    Args:
+        img: Source frame
+        regions: Fractional boxes to keep, stacked top to bottom in order
+
+    Returns:
+        Composite image containing only the given regions
+    """
+    crops = [
+        img.crop((
+            round(left * img.width),
+            round(top * img.height),
+            round(right * img.width),
+            round(bottom * img.height),
+        ))
+        for left, top, right, bottom in regions
+    ]
+    composite = Image.new(img.mode, (max(c.width for c in crops), sum(c.height for c in crops)))
+    y = 0
+    for crop in crops:
+        composite.paste(crop, (0, y))
+        y += crop.height
+    return composite
+
+
+def decode_image(image_bytes: bytes) -> Image.Image:
+    """Decode a screenshot once so hashing and every upload variant share it.
+
+    Args:
+        image_bytes: Encoded source image (e.g. PNG from screen capture)
+
+    Returns:
+        Decoded RGB image
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    img.load()
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+
+def encode_image(
+    img: Image.Image,
+    image_format: str = "WEBP",
+    grayscale: bool = False,
+    regions: tuple[Region, ...] | None = None,
+    low_detail: bool = False,
+) -> bytes:
+    """Encode an upload variant of a decoded screenshot.
+
+    Args:
+        img: Decoded source image; left unmodified
+        image_format: Upload format, one of `MIME_TYPES`
+        grayscale: Drop colour, for screens where only text carries signal
+        regions: Optional HUD regions to crop to before resizing
+        low_detail: Size for a low-detail request instead of the tile grid
+
+    Returns:
+        Image bytes encoded in `image_format`
+    """
+    if image_format not in MIME_TYPES:
+        raise ValueError(f"Unsupported upload format: {image_format}")
+
+    if regions:
+        img = crop_regions(img, regions)
+    if grayscale:
+        img = img.convert("L")
+
+    if low_detail:
+        scale = min(1.0, LOW_DETAIL_SIZE / max(img.width, img.height))
+        target = (round(img.width * scale), round(img.height * scale))
+    else:
+        target = fit_to_tile_grid(img.width, img.height)
+    if target != img.size:
+        img = img.resize(target, Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    if image_format == "WEBP":
+        img.save(buffer, format="WEBP", quality=WEBP_QUALITY, method=WEBP_METHOD)
+    elif image_format == "JPEG":
+        img.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    else:
+        img.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def dhash_image(img: Image.Image) -> int:
+    """Compute a 64-bit difference hash of a decoded image.
+
+    Near-identical frames (idle player, open menu) produce hashes within a
+    few bits of each other, so Hamming distance approximates visual change.
+
+    Args:
+        img: Decoded source image
+
+    Returns:
+        64-bit perceptual hash
+    """
+    img = img.convert("L")
+    luma = np.asarray(img.resize((9, 8), Image.Resampling.BILINEAR), dtype=np.uint8)
+    return int(_dhash_bits(luma))
+
+
+def nearest_hash(query: int, hashes: np.ndarray) -> tuple[int, int]:
+    """Find the hash closest to `query` by Hamming distance.
+
+    Args:
+        query: Hash to match
+        hashes: uint64 array of candidate hashes
+
+    Returns:
+        Tuple of (index of the closest hash, its distance), or (-1, 65) if
+        `hashes` is empty
+    """
+    index, distance = _nearest_hash(np.uint64(query), hashes)
+    return int(index), int(distance)
+
+
+def _dhash_bits_numpy(luma: np.ndarray) -> int:
+    """Pack the 8x8 neighbour comparisons into a 64-bit integer, row-major, MSB first."""
+    return int.from_bytes(np.packbits(luma[:, :-1] > luma[:, 1:]).tobytes(), "big")
+
+
+def _nearest_hash_numpy(query: np.uint64, hashes: np.ndarray) -> tuple[int, int]:
+    """Vectorised Hamming scan over all candidate hashes."""
+    if hashes.shape[0] == 0:
+        return -1, 65
+    distances = np.unpackbits((hashes ^ query).view(np.uint8)).reshape(-1, 64).sum(axis=1)
+    index = int(np.argmin(distances))
+    return index, int(distances[index])
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _dhash_bits(luma):
+        """Pack the 8x8 neighbour comparisons into a uint64, row-major, MSB first."""
+        value = np.uint64(0)
+        one = np.uint64(1)
+        for row in range(8):
+            for col in range(8):
+                value = (value << one) | np.uint64(luma[row, col] > luma[row, col + 1])
+        return value
+
+    @njit(cache=True)
+    def _nearest_hash(query, hashes):
+        """Hamming scan compiled to a popcount loop."""
+        best_index = -1
+        best_distance = 65
+        one = np.uint64(1)
+        for i in range(hashes.shape[0]):
+            x = query ^ hashes[i]
+            distance = 0
+            while x:
+                x &= x - one
+                distance += 1
+            if distance < best_distance:
+                best_index = i
+                best_distance = distance
+        return best_index, best_distance
+else:
+    logger.debug("numba not installed, using NumPy hash kernels")
+    _dhash_bits = _dhash_bits_numpy
+    _nearest_hash = _nearest_hash_numpy
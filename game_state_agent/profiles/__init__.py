@@ -0,0 +1,9 @@
+"""Game profiles supplying prompts and response schemas to the analyzer."""
+
+from .base import GameProfile
+from .clair_obscur import CLAIR_OBSCUR
+
+__all__ = [
+    "GameProfile",
+    "CLAIR_OBSCUR",
+]
@@ -0,0 +1,35 @@
+"""Per-game configuration for the screenshot analyzer."""
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from ..models import BatchedStateUpdate, ScreenType, StateUpdate
+from ..preprocess import Region
+
+
+class GameProfile(BaseModel):
+    """Prompts and response schema for analyzing one game's screenshots."""
+    model_config = ConfigDict(frozen=True)
+
+    name: str = Field(description="Display name of the game")
+    system_prompt: str = Field(description="System prompt shared by every request")
+    user_prompt: str = Field(description="Instruction sent with a single screenshot")
+    triage_prompt: str = Field(description="Instruction for the low-detail screen classification")
+    batch_user_prompt: str = Field(description="Instruction for several screenshots; formatted with {count}")
+    batch_triage_prompt: str = Field(description="Triage instruction for several screenshots; formatted with {count}")
+    delta_prompt: str = Field(description="Context sent with the previous frame's state; formatted with {previous}")
+    response_model: type[StateUpdate] = Field(
+        default=StateUpdate,
+        description="Structured output model for a single screenshot"
+    )
+    batch_response_model: type[BatchedStateUpdate] = Field(
+        default=BatchedStateUpdate,
+        description="Structured output model for several screenshots"
+    )
+    grayscale_screens: frozenset[ScreenType] = Field(
+        default=frozenset(),
+        description="Screen types whose high-detail upload is sent in grayscale because only text matters"
+    )
+    crop_regions: dict[ScreenType, tuple[Region, ...]] = Field(
+        default_factory=dict,
+        description="HUD regions, as fractional (left, top, right, bottom) boxes, to crop the high-detail upload to per screen type"
+    )
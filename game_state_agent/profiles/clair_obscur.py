@@ -0,0 +1,73 @@
+"""Clair Obscur: Expedition 33 game profile."""
+
+from ..models import BatchedStateUpdate, ScreenType, StateUpdate
+from .base import GameProfile
+
+# Only behavioural guardrails live here. What each screen type, update type
+# and field means is carried by the response schema's descriptions, which the
+# model already receives through structured outputs.
+SYSTEM_PROMPT = """<role_and_objective>
+You are a visual analyzer for Clair Obscur: Expedition 33 screenshots, tracking game state in real-time.
+Every detection must be grounded in what is directly observable in the current screenshot.
+Your outputs feed into a game state tracker and voice assistant—accuracy is critical.
+</role_and_objective>
+
+<temporal_limitations>
+Screenshots are captured every ~5 seconds. You will miss events between frames.
+
+Critical rules:
+- Report ONLY what is directly observable in the current screenshot
+- Do NOT infer what "must have happened" between screenshots
+- If state seems inconsistent with expectations, note this in uncertainty_notes
+- When you see result screens (death, victory), report the event without assuming cause
+- If location changed unexpectedly, report new location without inferring path
+- Prefer setting fields to null over guessing unobservable values
+</temporal_limitations>
+
+<factual_grounding>
+Every field you populate must be directly visible in the screenshot:
+- If text is partially obscured, report only the visible portion
+- If a value cannot be read clearly, set to null and note in uncertainty_notes
+- If multiple interpretations are possible, choose the most conservative
+- Never fill fields based on what "should" be there from game logic
+</factual_grounding>
+
+<output_guidelines>
+- Be conservative: if unsure, return "noop"
+- Always set screen_type based on visual evidence
+- Include brief reasoning explaining your detection
+- Populate only fields you can directly verify from the screenshot
+</output_guidelines>"""
+
+
+CLAIR_OBSCUR = GameProfile(
+    name="Clair Obscur: Expedition 33",
+    system_prompt=SYSTEM_PROMPT,
+    user_prompt="Analyze this Clair Obscur: Expedition 33 screenshot and determine if there's any game state to update.",
+    triage_prompt="Classify this Clair Obscur: Expedition 33 screenshot: what type of screen is it, and is any game state information visible?",
+    batch_user_prompt="Analyze these {count} Clair Obscur: Expedition 33 screenshots, captured in this order, and determine for each one if there's any game state to update.",
+    batch_triage_prompt="Classify each of these {count} Clair Obscur: Expedition 33 screenshots, in order: what type of screen is it, and is any game state information visible?",
+    delta_prompt=(
+        "State already reported for an earlier frame: {previous}\n"
+        "Report only fields that differ from it in this screenshot and leave unchanged fields null. "
+        "If nothing differs, return update_type noop."
+    ),
+    response_model=StateUpdate,
+    batch_response_model=BatchedStateUpdate,
+    # Menus and text screens; combat and gameplay keep colour for HP bars and effects
+    grayscale_screens=frozenset({
+        ScreenType.INVENTORY,
+        ScreenType.EQUIPMENT,
+        ScreenType.STATUS,
+        ScreenType.FLAG_MENU,
+        ScreenType.DEATH_SCREEN,
+        ScreenType.DIALOGUE,
+    }),
+    # Only the HUD carries state on these screens; the scenery is wasted tiles
+    crop_regions={
+        # Boss name and HP bar along the bottom, party HP/AP top-left
+        ScreenType.COMBAT: ((0.0, 0.65, 1.0, 1.0), (0.0, 0.0, 0.35, 0.25)),
+        # Area name banners appear top-centre or bottom-centre
+        ScreenType.GAMEPLAY: ((0.0, 0.0, 1.0, 0.2), (0.0, 0.8, 1.0, 1.0)),
+    },
+)
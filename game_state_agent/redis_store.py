@@ -15,6 +15,7 @@ Usage - Query the latest game state from Redis:
 import logging
 
 import redis
+import redis.asyncio
 
 from .config import GAME_STATE_KEY, REDIS_HOST, REDIS_PASSWORD, REDIS_PORT
 from .models import GameState
@@ -25,11 +26,17 @@ logger = logging.getLogger(__name__)
 class GameStateStore:
     """Stores and retrieves game state from Redis."""
 
-    def __init__(self, client: redis.Redis | None = None):
+    def __init__(
+        self,
+        client: redis.Redis | None = None,
+        async_client: redis.asyncio.Redis | None = None,
+    ):
         """Initialize the game state store.
 
         Args:
             client: Optional Redis client. If None, creates one from config.
+            async_client: Optional asyncio Redis client for `aload`. If None,
+                created from config on first use.
         """
         self._client = client or redis.Redis(
             host=REDIS_HOST,
@@ -37,6 +44,7 @@ class GameStateStore:
             password=REDIS_PASSWORD,
             decode_responses=True,
         )
+        self._async_client = async_client
         self._key = GAME_STATE_KEY
 
     def save(self, state: GameState) -> None:
@@ -55,7 +63,25 @@ class GameStateStore:
         Returns:
             The game state if found, None otherwise.
         """
-        json_data = self._client.get(self._key)
+        return self._parse(self._client.get(self._key))
+
+    async def aload(self) -> GameState | None:
+        """Async version of `load` for event-loop callers.
+
+        Returns:
+            The game state if found, None otherwise.
+        """
+        if self._async_client is None:
+            self._async_client = redis.asyncio.Redis(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                password=REDIS_PASSWORD,
+                decode_responses=True,
+            )
+        return self._parse(await self._async_client.get(self._key))
+
+    def _parse(self, json_data: str | None) -> GameState | None:
+        """Validate stored game state JSON, if any."""
         if json_data is None:
             logger.debug("No game state found in Redis")
             return None
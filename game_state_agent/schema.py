@@ -0,0 +1,39 @@
+"""Structured-output response formats, compiled once per model."""
+
+from functools import cache
+
+from openai.lib._pydantic import to_strict_json_schema
+from pydantic import BaseModel
+
+
+@cache
+def response_format(model: type[BaseModel]) -> dict:
+    """Build the strict JSON-schema response format for a Pydantic model.
+    
+    Equivalent to what `beta.chat.completions.parse` derives from the model
+    on every call, but computed only once per model.
+    
+    Args:
+        model: Pydantic model the response must conform to
+        
+    Returns:
+        `response_format` parameter for `chat.completions.create`
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": to_strict_json_schema(model),
+            "strict": True,
+        },
+    }
+
+
+def precompile(*models: type[BaseModel]) -> None:
+    """Compile response formats ahead of the first request.
+    
+    Args:
+        models: Pydantic models that will be used as response formats
+    """
+    for model in models:
+        response_format(model)
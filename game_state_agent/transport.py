@@ -0,0 +1,59 @@
+"""HTTP clients for the OpenAI SDK with faster JSON request serialization."""
+
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    logger.debug("orjson not installed, request bodies use stdlib json")
+
+
+def _orjson_kwargs(json: object, kwargs: dict) -> dict | None:
+    """Serialize a JSON body with orjson into httpx `build_request` kwargs.
+
+    Request bodies here are dominated by multi-megabyte base64 image strings,
+    which orjson escapes far faster than the stdlib encoder.
+
+    Args:
+        json: Body the SDK passed as `json=`
+        kwargs: Remaining `build_request` keyword arguments
+
+    Returns:
+        Updated kwargs with the body as `content`, or None to fall back to
+        httpx's own serialization
+    """
+    if orjson is None or json is None or kwargs.get("content") is not None:
+        return None
+    try:
+        content = orjson.dumps(json)
+    except TypeError:
+        return None
+
+    headers = httpx.Headers(kwargs.get("headers"))
+    headers.setdefault("Content-Type", "application/json")
+    return {**kwargs, "content": content, "headers": headers}
+
+
+class OrjsonClient(httpx.Client):
+    """httpx client that serializes JSON request bodies with orjson."""
+
+    def build_request(self, method: str, url: httpx.URL | str, *, json: object = None, **kwargs) -> httpx.Request:
+        fast_kwargs = _orjson_kwargs(json, kwargs)
+        if fast_kwargs is None:
+            return super().build_request(method, url, json=json, **kwargs)
+        return super().build_request(method, url, **fast_kwargs)
+
+
+class AsyncOrjsonClient(httpx.AsyncClient):
+    """Async httpx client that serializes JSON request bodies with orjson."""
+
+    def build_request(self, method: str, url: httpx.URL | str, *, json: object = None, **kwargs) -> httpx.Request:
+        fast_kwargs = _orjson_kwargs(json, kwargs)
+        if fast_kwargs is None:
+            return super().build_request(method, url, json=json, **kwargs)
+        return super().build_request(method, url, **fast_kwargs)
@@ -2,14 +2,23 @@
 Query Clair Obscur: Expedition 33 data from Redis Vector Database
 """
 
+import base64
+import hashlib
 import os
+import sqlite3
+import struct
+from functools import cache, lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-import numpy as np
 import redis
 from dotenv import load_dotenv
-from openai import OpenAI
+from redis.commands.search.document import Document
 from redis.commands.search.query import Query
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 # --- Configuration ---
 load_dotenv()
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
@@ -17,22 +26,94 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
 INDEX_NAME = "idx:npcs"
 VECTOR_DIM = 1536  # OpenAI text-embedding-3-small output dimension
+# Must match the index TYPE built by redis_setup/setup_redis.py
+VECTOR_TYPE = os.getenv("NPC_VECTOR_TYPE", "FLOAT16").upper()
 EMBEDDING_MODEL = "text-embedding-3-small"
+EMBED_CACHE_PATH = Path("data/embed_cache.sqlite")
+RESULT_FIELDS = ("name", "race", "role", "region", "description", "how_to_beat_tips")
 
 # --- Connect ---
-redis_client = redis.Redis(
-    host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD, decode_responses=True
-)
-openai_client = OpenAI()
+# Clients are created on first use, so importing this module (e.g. just for
+# get_entry) doesn't pay for the OpenAI SDK and its pydantic models.
+@cache
+def _redis() -> redis.Redis:
+    """Shared Redis client. Responses stay as bytes; only printed fields are decoded."""
+    pool = redis.ConnectionPool(
+        host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD, max_connections=8
+    )
+    return redis.Redis(connection_pool=pool)
 
 
-def get_embedding(text: str) -> list[float]:
-    """Get embedding for a single text using OpenAI API."""
-    response = openai_client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=text,
-    )
-    return response.data[0].embedding
+@cache
+def _openai() -> "OpenAI":
+    """Shared OpenAI client, imported lazily."""
+    from openai import OpenAI
+
+    return OpenAI()
+
+
+@cache
+def _embed_cache() -> sqlite3.Connection:
+    """On-disk query embedding cache, so repeat runs skip the OpenAI call."""
+    EMBED_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(EMBED_CACHE_PATH)
+    connection.execute("CREATE TABLE IF NOT EXISTS emb (key TEXT PRIMARY KEY, vec BLOB)")
+    return connection
+
+
+def get_embedding(text: str) -> bytes:
+    """Get the packed embedding bytes for a single text using OpenAI API."""
+    return get_embeddings([text])[0]
+
+
+def get_embeddings(texts: list[str]) -> list[bytes]:
+    """
+    Get embeddings for several texts as packed VECTOR_TYPE bytes.
+
+    Texts embedded before are read from the on-disk cache; the rest are sent
+    to OpenAI in a single request and cached.
+    """
+    keys = [_embed_cache_key(text) for text in texts]
+    embed_cache = _embed_cache()
+    embeddings = {}
+    for key in keys:
+        row = embed_cache.execute("SELECT vec FROM emb WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            embeddings[key] = row[0]
+
+    missing = {key: text for key, text in zip(keys, texts) if key not in embeddings}
+    if missing:
+        response = _openai().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=list(missing.values()),
+            encoding_format="base64",
+        )
+        for key, item in zip(missing, sorted(response.data, key=lambda item: item.index)):
+            # base64 payload is little-endian float32; narrow it to the index type
+            vector = _to_vector_type(base64.b64decode(item.embedding))
+            embeddings[key] = vector
+            embed_cache.execute("INSERT OR REPLACE INTO emb VALUES (?, ?)", (key, vector))
+        embed_cache.commit()
+
+    return [embeddings[key] for key in keys]
+
+
+def _to_vector_type(float32_bytes: bytes) -> bytes:
+    """Repack little-endian float32 vector bytes as VECTOR_TYPE."""
+    if VECTOR_TYPE == "FLOAT32":
+        return float32_bytes
+    count = len(float32_bytes) // 4
+    values = struct.unpack(f"<{count}f", float32_bytes)
+    if VECTOR_TYPE == "INT8":
+        # Per-vector scale to [-127, 127]; cosine distance ignores the scale
+        scale = 127 / (max(map(abs, values)) or 1.0)
+        return struct.pack(f"<{count}b", *(round(value * scale) for value in values))
+    return struct.pack(f"<{count}e", *values)
+
+
+def _embed_cache_key(text: str) -> str:
+    """Cache key for a text's embedding under the current model and vector type."""
+    return hashlib.sha256(f"{EMBEDDING_MODEL}:{VECTOR_TYPE}:{text}".encode("utf-8")).hexdigest()
 
 
 def semantic_search(query_text, top_k=3, filter_expr="*"):
@@ -44,31 +125,60 @@ def semantic_search(query_text, top_k=3, filter_expr="*"):
         top_k: Number of results to return
         filter_expr: Optional filter (e.g., "@region:{The Continent}")
 
+    Returns:
+        List of matching entries with scores. If the filter alone matches
+        top_k entries or fewer, those are returned unranked and without
+        scores, skipping the embedding call.
+    """
+    if filter_expr != "*":
+        search = _redis().ft(INDEX_NAME)
+        total = search.search(Query(filter_expr).paging(0, 0)).total
+        if total <= top_k:
+            query = Query(filter_expr).return_fields(*RESULT_FIELDS).paging(0, top_k)
+            return search.search(query).docs
+    return vector_search(get_embedding(query_text), top_k, filter_expr)
+
+
+def vector_search(query_embedding, top_k=3, filter_expr="*"):
+    """
+    Search by similarity to a precomputed query embedding.
+
+    Args:
+        query_embedding: Packed embedding bytes of the query (see get_embeddings)
+        top_k: Number of results to return
+        filter_expr: Optional filter (e.g., "@region:{The Continent}")
+
     Returns:
         List of matching entries with scores
     """
-    query_embedding = np.array(get_embedding(query_text), dtype=np.float32)
+    query, params = _knn_query(query_embedding, top_k, filter_expr)
+    return _redis().ft(INDEX_NAME).search(query, params).docs
 
-    query = (
+
+def _knn_query(query_embedding, top_k=3, filter_expr="*"):
+    """Get a KNN query and its parameters for a query embedding."""
+    return _knn_search_query(top_k, filter_expr), {"query_vec": query_embedding}
+
+
+@lru_cache(maxsize=128)
+def _knn_search_query(top_k, filter_expr):
+    """Build a KNN query once per shape; only the query vector varies per call."""
+    return (
         Query(f"({filter_expr})=>[KNN {top_k} @embedding $query_vec AS score]")
         .sort_by("score")
-        .return_fields(
-            "score", "name", "race", "role", "region", "description", "how_to_beat_tips"
-        )
+        .return_fields("score", *RESULT_FIELDS)
         .dialect(2)
     )
 
-    results = redis_client.ft(INDEX_NAME).search(
-        query, {"query_vec": query_embedding.tobytes()}
-    )
-
-    return results.docs
-
 
+@lru_cache(maxsize=128)
 def filter_search(filter_expr):
     """
     Search by metadata filters.
 
+    Results are memoized per filter expression as a tuple; call
+    invalidate_filter_cache() after reloading the data.
+
     Examples:
         "@region:{The Continent}"
         "@role:{Merchant}"
@@ -76,33 +186,65 @@ def filter_search(filter_expr):
         "@race:{Challenge}"
         "@race:{Secret}"
     """
-    query = Query(filter_expr).return_fields("name", "role", "region", "drops")
-    return redis_client.ft(INDEX_NAME).search(query).docs
+    return tuple(_redis().ft(INDEX_NAME).search(_filter_query(filter_expr)).docs)
+
+
+def invalidate_filter_cache():
+    """Drop memoized filter_search results."""
+    filter_search.cache_clear()
+
+
+def _filter_query(filter_expr):
+    """Build a metadata filter query."""
+    return Query(filter_expr).return_fields("name", "role", "region", "drops")
+
+
+def search_many(queries):
+    """
+    Run several searches in a single Redis round trip.
+
+    Args:
+        queries: List of (Query, params or None) tuples
+
+    Returns:
+        List of result documents per query, in the same order
+    """
+    pipe = _redis().pipeline(transaction=False)
+    for query, params in queries:
+        args = [INDEX_NAME, *query.get_args()]
+        if params:
+            args += ["PARAMS", 2 * len(params)]
+            for name, value in params.items():
+                args += [name, value]
+        pipe.execute_command("FT.SEARCH", *args)
+    return [_parse_search_reply(reply) for reply in pipe.execute()]
+
+
+def _parse_search_reply(reply):
+    """Turn a raw FT.SEARCH reply ([total, id, fields, id, fields, ...]) into documents.
+
+    Field names are decoded so they can be read as attributes; values are
+    left as bytes until printed.
+    """
+    return [
+        Document(
+            _text(doc_id),
+            **{_text(name): value for name, value in zip(fields[::2], fields[1::2])},
+        )
+        for doc_id, fields in zip(reply[1::2], reply[2::2])
+    ]
+
+
+def _text(value):
+    """Decode a Redis value to str if it is still bytes."""
+    return value.decode("utf-8") if isinstance(value, bytes) else value
 
 
 def get_entry(entry_id):
     """Get a specific entry by ID (excludes binary embedding field)."""
-    fields = [
-        "id",
-        "name",
-        "race",
-        "role",
-        "locations",
-        "region",
-        "affiliation",
-        "quest",
-        "is_hostile",
-        "becomes_hostile",
-        "drops",
-        "description",
-        "lore",
-        "dialogue",
-        "weakness",
-        "resistance",
-        "how_to_beat_tips",
-    ]
-    values = redis_client.hmget(f"npc:{entry_id}", fields)
-    return {k: v for k, v in zip(fields, values) if v}
+    entry = _redis().hgetall(f"npc:{entry_id}")
+    entry.pop(b"embedding", None)
+    return {k.decode("utf-8"): v.decode("utf-8") for k, v in entry.items() if v}
 
 
 def print_results(results, show_description=True):
@@ -110,13 +252,15 @@ def print_results(results, show_description=True):
     for i, doc in enumerate(results, 1):
         score = getattr(doc, "score", None)
         score_str = f" (similarity: {1 - float(score):.2f})" if score else ""
-        print(f"\n{i}. {doc.name}{score_str}")
-        print(f"   Type: {doc.race} | Role: {doc.role} | Region: {doc.region}")
+        print(f"\n{i}. {_text(doc.name)}{score_str}")
+        race, role, region = (_text(getattr(doc, field, "")) for field in ("race", "role", "region"))
+        print(f"   Type: {race} | Role: {role} | Region: {region}")
         if show_description and hasattr(doc, "description"):
+            description = _text(doc.description)
             desc = (
-                doc.description[:150] + "..."
-                if len(doc.description) > 150
-                else doc.description
+                description[:150] + "..."
+                if len(description) > 150
+                else description
             )
             print(f"   {desc}")
 
@@ -127,43 +271,38 @@ def main():
     print("CLAIR OBSCUR: EXPEDITION 33 - VECTOR DATABASE")
     print("=" * 60)
 
-    # Semantic search examples
-    print("\n### Search: 'boss with shields and flowers' ###")
-    results = semantic_search("boss with shields and flowers")
-    print_results(results)
-
-    print("\n### Search: 'how to get weapon for Maelle' ###")
-    results = semantic_search("how to get weapon for Maelle")
-    print_results(results)
+    # Semantic search examples (all queries embedded in one API call)
+    queries = [
+        "boss with shields and flowers",
+        "how to get weapon for Maelle",
+        "secret hidden items",
+        "how to cross the sea",
+    ]
+    # (title, filter, show region)
+    filters = [
+        ("All Bosses", "@role:{Boss}", False),
+        ("All Merchants", "@role:{Merchant}", True),
+        ("Side Quests", "@race:{Side Quest}", False),
+        ("Secrets", "@race:{Secret}", False),
+    ]
 
-    print("\n### Search: 'secret hidden items' ###")
-    results = semantic_search("secret hidden items")
-    print_results(results)
+    # Every search goes to Redis in one pipelined round trip
+    searches = [_knn_query(embedding) for embedding in get_embeddings(queries)]
+    searches += [(_filter_query(filter_expr), None) for _, filter_expr, _ in filters]
+    all_results = search_many(searches)
 
-    print("\n### Search: 'how to cross the sea' ###")
-    results = semantic_search("how to cross the sea")
-    print_results(results)
+    for query_text, results in zip(queries, all_results):
+        print(f"\n### Search: '{query_text}' ###")
+        print_results(results)
 
     # Filter examples
-    print("\n### Filter: All Bosses ###")
-    results = filter_search("@role:{Boss}")
-    for doc in results:
-        print(f"  - {doc.name}")
-
-    print("\n### Filter: All Merchants ###")
-    results = filter_search("@role:{Merchant}")
-    for doc in results:
-        print(f"  - {doc.name} in {doc.region}")
-
-    print("\n### Filter: Side Quests ###")
-    results = filter_search("@race:{Side Quest}")
-    for doc in results:
-        print(f"  - {doc.name}")
-
-    print("\n### Filter: Secrets ###")
-    results = filter_search("@race:{Secret}")
-    for doc in results:
-        print(f"  - {doc.name}")
+    for (title, _, show_region), results in zip(filters, all_results[len(queries):]):
+        print(f"\n### Filter: {title} ###")
+        for doc in results:
+            if show_region:
+                print(f"  - {_text(doc.name)} in {_text(getattr(doc, 'region', ''))}")
+            else:
+                print(f"  - {_text(doc.name)}")
 
 
 if __name__ == "__main__":
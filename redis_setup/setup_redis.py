@@ -3,13 +3,18 @@ Elden Ring NPC Vector Database Setup
 Loads NPC data into Redis with vector embeddings for semantic search.
 """
 
+import asyncio
+import base64
+import hashlib
 import json
 import os
+import sqlite3
+from itertools import batched
 
 import numpy as np
 import redis
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from redis.commands.search.field import TagField, TextField, VectorField
 from redis.commands.search.index_definition import IndexDefinition, IndexType
 
@@ -21,7 +26,16 @@ REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
 INDEX_NAME = "idx:npcs"
 NPC_PREFIX = "npc:"
 VECTOR_DIM = 1536  # OpenAI text-embedding-3-small output dimension
+# FLOAT16 halves vector memory and KNN scan bandwidth; INT8 quarters it
+# (RediSearch 8+); FLOAT32 for older RediSearch
+VECTOR_TYPE = os.getenv("NPC_VECTOR_TYPE", "FLOAT16").upper()
+VECTOR_DTYPES = {"FLOAT32": np.float32, "FLOAT16": np.float16, "INT8": np.int8}
+if VECTOR_TYPE not in VECTOR_DTYPES:
+    raise ValueError(f"NPC_VECTOR_TYPE must be one of {sorted(VECTOR_DTYPES)}, got {VECTOR_TYPE!r}")
 EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_BATCH_SIZE = 256  # Inputs per embeddings request
+EMBEDDING_CONCURRENCY = 5  # Embeddings requests in flight at once
+PIPELINE_CHUNK_SIZE = 500  # HSETs buffered before each pipeline flush
 
 # --- Connect to Redis ---
 # Note: decode_responses=False for binary vector data
@@ -35,23 +49,58 @@ client = redis.Redis(
 print("Connected to Redis")
 
 # --- Load NPC Data ---
+# Entries are streamed when ijson is installed, so only one batch is resident
+try:
+    import ijson
+except ImportError:
+    ijson = None
+    print("ijson not installed, loading the whole NPC file at once")
+
 project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-with open(os.path.join(project_dir, "data/npcs.json"), "r") as f:
-    npcs = json.load(f)
+NPC_DATA_PATH = os.path.join(project_dir, "data/npcs.json")
+
+
+def iter_npcs(path):
+    """Yield NPC entries from the JSON array at `path`."""
+    with open(path, "rb") as f:
+        if ijson is not None:
+            yield from ijson.items(f, "item", use_float=True)
+        else:
+            yield from json.load(f)
+
 
-print(f"Loaded {len(npcs)} NPCs")
+async def get_embeddings(
+    texts: list[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_concurrency: int = EMBEDDING_CONCURRENCY,
+) -> list[bytes]:
+    """Get embeddings for a list of texts using OpenAI API.
 
-# --- Initialize OpenAI Client ---
-openai_client = OpenAI()
+    Texts are sent in chunks of `batch_size`, with up to `max_concurrency`
+    requests in flight; results are returned in input order as little-endian
+    float32 bytes (requested as base64, so no per-element Python floats).
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
 
+    async def embed_chunk(openai_client: AsyncOpenAI, chunk: list[str]) -> list[bytes]:
+        async with semaphore:
+            response = await openai_client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=chunk,
+                encoding_format="base64",
+            )
+        return [
+            base64.b64decode(item.embedding)
+            for item in sorted(response.data, key=lambda item: item.index)
+        ]
 
-def get_embeddings(texts: list[str]) -> list[list[float]]:
-    """Get embeddings for a list of texts using OpenAI API."""
-    response = openai_client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=texts,
-    )
-    return [item.embedding for item in response.data]
+    chunks = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    # Each asyncio.run gets its own client: pooled connections are bound to
+    # the event loop they were opened on. The SDK retries 429s and 5xx
+    # itself, honoring Retry-After.
+    async with AsyncOpenAI(max_retries=5) as openai_client:
+        results = await asyncio.gather(*(embed_chunk(openai_client, chunk) for chunk in chunks))
+    return [embedding for chunk_embeddings in results for embedding in chunk_embeddings]
 
 # --- Create Embeddings ---
 # Combine description + lore + dialogue + tips for richer embeddings
@@ -64,43 +113,94 @@ def create_embedding_text(npc):
     ]
     return " ".join(parts)
 
-print("Generating embeddings via OpenAI API...")
-embedding_texts = [create_embedding_text(npc) for npc in npcs]
-embeddings = np.array(get_embeddings(embedding_texts), dtype=np.float32)
+
+def embed_cache_key(text):
+    """Cache key for a text's embedding (same scheme as query_npcs.py)."""
+    return hashlib.sha256(f"{EMBEDDING_MODEL}:{VECTOR_TYPE}:{text}".encode("utf-8")).hexdigest()
+
+# Embeddings are cached on disk, so re-runs only embed new or changed entries
+embed_cache = sqlite3.connect(os.path.join(project_dir, "data/embed_cache.sqlite"))
+embed_cache.execute("CREATE TABLE IF NOT EXISTS emb (key TEXT PRIMARY KEY, vec BLOB)")
+
+
+def to_vectors(embeddings):
+    """Convert float32 embedding bytes to a VECTOR_TYPE array, one row per embedding."""
+    vectors = np.frombuffer(b"".join(embeddings), dtype="<f4").reshape(len(embeddings), VECTOR_DIM)
+    if VECTOR_TYPE == "INT8":
+        # Per-vector scale to [-127, 127]; cosine distance ignores the scale
+        peaks = np.abs(vectors).max(axis=1, keepdims=True)
+        vectors = np.round(vectors * (127 / np.where(peaks > 0, peaks, 1.0)))
+    return vectors.astype(VECTOR_DTYPES[VECTOR_TYPE])
+
+
+def embed_batch(npcs):
+    """Get VECTOR_TYPE embeddings for a batch of NPCs, embedding only cache misses.
+
+    NPCs with no text to embed get None and are kept out of the vector index.
+    """
+    embedding_texts = [create_embedding_text(npc).strip() for npc in npcs]
+    texts_by_key = {embed_cache_key(text): text for text in embedding_texts if text}
+    vectors = {}
+    for key in texts_by_key:
+        row = embed_cache.execute("SELECT vec FROM emb WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            vectors[key] = row[0]
+
+    missing = [key for key in texts_by_key if key not in vectors]
+    print(f"Generating {len(missing)} embeddings via OpenAI API ({len(vectors)} cached)...")
+    if missing:
+        fresh = to_vectors(asyncio.run(get_embeddings([texts_by_key[key] for key in missing])))
+        for key, vector in zip(missing, fresh):
+            vectors[key] = vector.tobytes()
+            embed_cache.execute("INSERT OR REPLACE INTO emb VALUES (?, ?)", (key, vectors[key]))
+        embed_cache.commit()
+
+    return [vectors[embed_cache_key(text)] if text else None for text in embedding_texts]
 
 # --- Store NPCs in Redis ---
+# One batch at a time: embed, queue its HSETs and flush, so memory stays
+# bounded however large the data file grows. Writes are independent, so
+# the pipeline skips MULTI/EXEC.
 print("Storing NPCs in Redis...")
-pipeline = client.pipeline()
-
-for npc, embedding in zip(npcs, embeddings):
-    key = f"{NPC_PREFIX}{npc['id']}"
-
-    # Prepare document - convert lists to comma-separated strings for TAG fields
-    doc = {
-        "id": npc["id"],
-        "name": npc["name"],
-        "race": npc["race"],
-        "role": npc["role"],
-        "locations": ",".join(npc["locations"]),
-        "region": npc["region"],
-        "affiliation": npc["affiliation"],
-        "quest": npc["quest"],
-        "is_hostile": str(npc["is_hostile"]).lower(),
-        "becomes_hostile": str(npc["becomes_hostile"]).lower(),
-        "drops": ",".join(npc["drops"]) if npc["drops"] else "",
-        "description": npc["description"],
-        "lore": npc["lore"],
-        "dialogue": npc.get("dialogue", ""),
-        "weakness": npc.get("weakness", ""),
-        "resistance": npc.get("resistance", ""),
-        "how_to_beat_tips": npc.get("how_to_beat_tips", ""),
-        "embedding": embedding.tobytes()  # Store as raw bytes
-    }
-
-    pipeline.hset(key, mapping=doc)
-
-pipeline.execute()
-print(f"Stored {len(npcs)} NPCs")
+pipeline = client.pipeline(transaction=False)
+stored = 0
+
+for npcs in batched(iter_npcs(NPC_DATA_PATH), PIPELINE_CHUNK_SIZE):
+    for npc, embedding in zip(npcs, embed_batch(npcs)):
+        key = f"{NPC_PREFIX}{npc['id']}"
+
+        # Prepare document - convert lists to comma-separated strings for TAG fields
+        doc = {
+            "name": npc["name"],
+            "race": npc["race"],
+            "role": npc["role"],
+            "locations": ",".join(npc["locations"]),
+            "region": npc["region"],
+            "affiliation": npc["affiliation"],
+            "quest": npc["quest"],
+            "is_hostile": str(npc["is_hostile"]).lower(),
+            "becomes_hostile": str(npc["becomes_hostile"]).lower(),
+            "drops": ",".join(npc["drops"]) if npc["drops"] else "",
+            "description": npc["description"],
+            "lore": npc["lore"],
+            "dialogue": npc.get("dialogue", ""),
+            "weakness": npc.get("weakness", ""),
+            "resistance": npc.get("resistance", ""),
+            "how_to_beat_tips": npc.get("how_to_beat_tips", ""),
+        }
+        # Skip empty fields (readers default them to ""); the id is already in the key
+        doc = {field: value for field, value in doc.items() if value}
+        if embedding is not None:
+            doc["embedding"] = embedding  # Store as raw bytes
+
+        # Replace rather than merge, so fields dropped since the last run (and
+        # old-type embedding blobs) don't linger in the hash
+        pipeline.delete(key)
+        pipeline.hset(key, mapping=doc)
+
+    pipeline.execute()
+    stored += len(npcs)
+    print(f"Stored {stored} NPCs")
 
 # --- Create Search Index ---
 print("Creating search index...")
@@ -128,13 +228,17 @@ schema = (
     TextField("weakness"),
     TextField("resistance"),
     TextField("how_to_beat_tips"),
+    # HNSW keeps KNN queries sublinear in the number of entries
     VectorField(
         "embedding",
-        "FLAT",
+        "HNSW",
         {
-            "TYPE": "FLOAT32",
+            "TYPE": VECTOR_TYPE,
             "DIM": VECTOR_DIM,
             "DISTANCE_METRIC": "COSINE",
+            "M": 16,
+            "EF_CONSTRUCTION": 200,
+            "EF_RUNTIME": 40,
         },
     ),
 )
@@ -147,6 +251,6 @@ client.ft(INDEX_NAME).create_index(
 
 print(f"Created index: {INDEX_NAME}")
 print("\n--- Setup Complete ---")
-print(f"NPCs stored: {len(npcs)}")
+print(f"NPCs stored: {stored}")
 print(f"Index: {INDEX_NAME}")
 print(f"Key prefix: {NPC_PREFIX}")
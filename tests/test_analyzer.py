@@ -0,0 +1,28 @@
+"""Tests for the screenshot analyzer's request construction."""
+
+import json
+
+from game_state_agent.analyzer import ScreenshotAnalyzer, _text_part
+from game_state_agent.cache import AnalysisCache, PerceptualCache
+
+
+def test_build_messages_reuses_system_message(tmp_path):
+    analyzer = ScreenshotAnalyzer(
+        client=object(),
+        triage=False,
+        frame_cache=PerceptualCache(),
+        analysis_cache=AnalysisCache(tmp_path / "cache.db", prompt_version="test", model="test"),
+    )
+
+    first = analyzer._build_messages(analyzer._user_text_part, ["aGVsbG8="], detail="high")
+    second = analyzer._build_messages(
+        analyzer._user_text_part,
+        ["d29ybGQ="],
+        detail="high",
+        context_part=_text_part("Previously reported: {}"),
+    )
+
+    # The prompt-cache prefix is the same object, so it serializes identically
+    assert first[0] is second[0]
+    assert json.dumps(first[0]).encode() == json.dumps(second[0]).encode()
+    assert first[1]["content"][0] is second[1]["content"][0]
@@ -1,7 +1,10 @@
 """Gaming Coach Voice Agent - Main orchestrator."""
 
-import sys
+import asyncio
 import os
+import re
+import sys
+import threading
 
 import logfire
 from dotenv import find_dotenv, load_dotenv
@@ -14,6 +17,9 @@ from voice_agent.src.stt import SpeechToText
 from voice_agent.src.tts import TextToSpeech
 from voice_agent.src.coach import Coach
 
+# Whitespace after sentence-ending punctuation, where streamed text is cut for speech
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
 
 class GamingCoach:
     """Main orchestrator for the gaming coach voice agent."""
@@ -30,6 +36,11 @@ class GamingCoach:
         self._coach = Coach()
         self._game_store = GameStateStore()
 
+        # Responses stream on one long-lived event loop, so the coach's async
+        # clients keep their connections across turns
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="coach", daemon=True).start()
+
         # State
         self._screenshot: bytes | None = None
         self._running = False
@@ -72,20 +83,14 @@ class GamingCoach:
                 print("  No speech detected.")
                 return
 
-            # Get coach response (with screenshot for vision)
-            print("  Thinking...", end=" ", flush=True)
-            response = self._coach.get_response(
-                user_message=transcript,
-                screenshot=self._screenshot,
-            )
+            # Stream the coach response (with screenshot for vision), speaking
+            # each sentence while the rest is still being generated
+            print("  Thinking and speaking...", end=" ", flush=True)
+            response = asyncio.run_coroutine_threadsafe(
+                self._respond(transcript, self._screenshot), self._loop
+            ).result()
             print(f'"{response}"')
 
-            # Synthesize and play response
-            print("  Speaking...", flush=True)
-            audio_response = self._tts.synthesize(response)
-            with logfire.span("play_audio", audio_size_bytes=len(audio_response)):
-                self._player.play(audio_response)
-
         except Exception as e:
             logfire.exception("Voice interaction failed")
             print(f"\n  Error: {e}")
@@ -100,6 +105,49 @@ class GamingCoach:
         finally:
             self._screenshot = None
 
+    async def _respond(self, transcript: str, screenshot: bytes | None) -> str:
+        """Stream a coach response, queueing complete sentences for speech.
+
+        Args:
+            transcript: The user's transcribed question.
+            screenshot: Screenshot captured when PTT was pressed, if any.
+
+        Returns:
+            The full response text.
+        """
+        sentences: asyncio.Queue[str | None] = asyncio.Queue()
+        speaker = asyncio.create_task(self._speak_sentences(sentences))
+        parts = []
+        pending = ""
+        try:
+            async for chunk in self._coach.stream_response(
+                user_message=transcript,
+                screenshot=screenshot,
+            ):
+                parts.append(chunk)
+                *complete, pending = _SENTENCE_END.split(pending + chunk)
+                for sentence in complete:
+                    sentences.put_nowait(sentence)
+            sentences.put_nowait(pending)
+        finally:
+            # Finish speaking what was queued before returning or raising
+            sentences.put_nowait(None)
+            await speaker
+        return "".join(parts)
+
+    async def _speak_sentences(self, sentences: asyncio.Queue) -> None:
+        """Speak queued sentences in order until a None sentinel is received."""
+        while (sentence := await sentences.get()) is not None:
+            if sentence.strip():
+                # Synthesis and playback block, so they run off the event loop
+                await asyncio.to_thread(self._speak, sentence)
+
+    def _speak(self, text: str) -> None:
+        """Synthesize text and play it."""
+        audio_response = self._tts.synthesize(text)
+        with logfire.span("play_audio", audio_size_bytes=len(audio_response)):
+            self._player.play(audio_response)
+
     def _on_quit(self) -> None:
         """Called when ESC is pressed."""
         print("\n\nShutting down...")
@@ -133,6 +181,8 @@ class GamingCoach:
         # Wait for quit signal
         self._ptt.wait()
 
+        asyncio.run_coroutine_threadsafe(self._coach.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
         print("Goodbye!")
 
 
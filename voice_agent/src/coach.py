@@ -1,10 +1,15 @@
 """Gaming Coach LLM using OpenAI with semantic caching."""
 
+import asyncio
 import base64
+import hashlib
 import os
+import re
+from collections import deque
+from collections.abc import AsyncIterator
 
 import logfire
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from .context import ContextProvider
 from .semantic_cache import SemanticCache
@@ -91,6 +96,30 @@ For exploration questions: Provide direction without spoilers unless explicitly
 For lore questions: Share what's relevant to gameplay; avoid deep story spoilers.
 </query_handling>"""
 
+EMPTY_MESSAGE_RESPONSE = "I didn't catch that. Could you repeat your question?"
+MAX_COMPLETION_TOKENS = 150  # Keep responses very concise for speech
+
+# Cache lifetime by prompt kind, first match wins (seconds; 0 = never cached).
+# Answers about the player's live state go stale as soon as the game moves on,
+# while mechanics and lore answers hold for a long time.
+_NO_CACHE = 0
+_CACHE_TTL_RULES = (
+    (
+        re.compile(r"\b(my|our|am i|i'm|current(ly)?|right now|this (boss|fight|area))\b", re.I),
+        _NO_CACHE,
+    ),
+    (
+        re.compile(r"\b(lore|story|who (is|are|was)|what (is|are) (a|an|the)?|how does)\b", re.I),
+        24 * 60 * 60,
+    ),
+)
+
+# Canned reply that follows the injected context message
+_CONTEXT_ACK = {
+    "role": "assistant",
+    "content": "Got it, I'll use this context to help answer your questions.",
+}
+
 
 class Coach:
     """Gaming coach powered by OpenAI."""
@@ -121,13 +150,19 @@ class Coach:
                 "OpenAI API key required. Set OPENAI_API_KEY env var or pass api_key."
             )
         self._client = OpenAI(api_key=self._api_key)
+        self._async_client = AsyncOpenAI(api_key=self._api_key)
         self._model = model
         self._system_prompt = system_prompt or DEFAULT_SYSTEM_PROMPT
-        self._max_history = max_history
-        self._history: list[dict] = []
+        self._system_message = {"role": "system", "content": self._system_prompt}
+        # Oldest messages fall off automatically once max_history is reached
+        self._history: deque[dict] = deque(maxlen=max_history)
+        # (digest, data URL) of the last screenshot, reused for identical frames
+        self._last_image: tuple[bytes, str] | None = None
         self._cache = SemanticCache() if enable_cache else None
         self._context = (
-            ContextProvider(openai_client=self._client) if enable_context else None
+            ContextProvider(async_openai_client=self._async_client)
+            if enable_context
+            else None
         )
 
     @logfire.instrument("Coach.get_response")
@@ -147,41 +182,147 @@ class Coach:
             Coach's response text.
         """
         if not user_message.strip():
-            return "I didn't catch that. Could you repeat your question?"
+            return EMPTY_MESSAGE_RESPONSE
+
+        cached_response = self._cache_lookup(user_message, screenshot)
+        if cached_response:
+            self._record_cached_response(user_message, cached_response)
+            return cached_response
 
-        # Try semantic cache first (only for text-only queries without screenshots)
-        if not screenshot and self._cache and self._cache.enabled:
-            cached_response = self._cache.search(user_message)
-            if cached_response:
-                logfire.info(
-                    "Cache hit for query",
-                    query_preview=user_message[:50],
-                    cache_hit=True,
-                )
-                # Add to history so conversation context stays consistent
-                self._history.append({"role": "user", "content": user_message})
-                self._history.append({"role": "assistant", "content": cached_response})
-                if len(self._history) > self._max_history:
-                    self._history = self._history[-self._max_history :]
-                return cached_response
-
-        # Fetch context from Redis (game state + NPC search)
         context_str = None
         if self._context:
             with logfire.span("fetch_redis_context"):
                 context_str = self._context.get_context_for_query(user_message)
-            if context_str:
-                logfire.info("Fetched context from Redis", has_context=True)
+        messages, has_context = self._build_messages(user_message, screenshot, context_str)
+
+        # Get response from OpenAI (auto-instrumented by logfire.instrument_openai())
+        response = self._client.chat.completions.create(
+            model=self._model,
+            messages=messages,
+            max_completion_tokens=MAX_COMPLETION_TOKENS,
+        )
+
+        assistant_message = response.choices[0].message.content or ""
+        self._record_response(user_message, screenshot, assistant_message, has_context)
+        return assistant_message
+
+    async def stream_response(
+        self,
+        user_message: str,
+        screenshot: bytes | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a coaching response as it is generated.
+
+        Same flow as get_response, but text is yielded as soon as the model
+        produces it, so speech synthesis can start on the first tokens.
+
+        Args:
+            user_message: The user's transcribed question.
+            screenshot: Optional screenshot bytes (JPEG) for vision models.
+
+        Yields:
+            Chunks of the coach's response text.
+        """
+        if not user_message.strip():
+            yield EMPTY_MESSAGE_RESPONSE
+            return
+
+        # The span only covers work up to the first yield: a span held open
+        # across yields detaches its context if the consumer stops early
+        with logfire.span("Coach.stream_response"):
+            # Only the cache RPC runs on a worker thread; history is changed
+            # on the event loop thread
+            cached_response = await asyncio.to_thread(self._cache_lookup, user_message, screenshot)
+            if not cached_response:
+                context_str = None
+                if self._context:
+                    with logfire.span("fetch_redis_context"):
+                        context_str = await self._context.aget_context_for_query(user_message)
+                messages, has_context = self._build_messages(user_message, screenshot, context_str)
+
+                stream = await self._async_client.chat.completions.create(
+                    model=self._model,
+                    messages=messages,
+                    max_completion_tokens=MAX_COMPLETION_TOKENS,
+                    stream=True,
+                )
+
+        if cached_response:
+            self._record_cached_response(user_message, cached_response)
+            yield cached_response
+            return
+
+        parts = []
+        complete = False
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            complete = True
+        finally:
+            # Record the turn even if the consumer stopped early, but never
+            # cache a cut-off answer
+            assistant_message = "".join(parts)
+            self._record_response(
+                user_message, screenshot, assistant_message, has_context, cache=False
+            )
+            if complete:
+                # The semantic cache store is a blocking HTTP call
+                await asyncio.to_thread(
+                    self._cache_response, user_message, screenshot, assistant_message
+                )
+
+    def _cache_lookup(self, user_message: str, screenshot: bytes | None) -> str | None:
+        """Return a semantically cached response, if any. Doesn't touch history."""
+        # Only text-only queries without screenshots are cached
+        if screenshot or not self._cache or not self._cache.enabled:
+            return None
+        if _cache_ttl(user_message) == _NO_CACHE:
+            return None
+
+        cached_response = self._cache.search(user_message)
+        if cached_response:
+            logfire.info(
+                "Cache hit for query",
+                query_preview=user_message[:50],
+                cache_hit=True,
+            )
+        return cached_response
+
+    def _record_cached_response(self, user_message: str, cached_response: str) -> None:
+        """Add a cache-answered turn to history so conversation context stays consistent."""
+        self._history.append({"role": "user", "content": user_message})
+        self._history.append({"role": "assistant", "content": cached_response})
+
+    def _build_messages(
+        self, user_message: str, screenshot: bytes | None, context_str: str | None
+    ) -> tuple[list[dict], bool]:
+        """Add the user turn to history and build the request messages.
+
+        Args:
+            user_message: The user's transcribed question.
+            screenshot: Optional screenshot bytes (JPEG) for vision models.
+            context_str: Game state and NPC context fetched from Redis, if any.
+
+        Returns:
+            The messages to send, and whether game context was injected.
+        """
+        if context_str:
+            logfire.info("Fetched context from Redis", has_context=True)
 
         # Build the user message content
         if screenshot:
             # Vision-enabled request with image
-            b64_image = base64.b64encode(screenshot).decode("utf-8")
             content = [
                 {"type": "text", "text": user_message},
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{b64_image}"},
+                    "image_url": {"url": self._image_data_url(screenshot)},
                 },
             ]
             logfire.info(
@@ -192,17 +333,14 @@ class Coach:
         else:
             content = user_message
 
+        # Only the latest screenshot is worth re-sending; earlier turns keep their text
+        self._strip_history_images()
+
         # Add user message to history
         self._history.append({"role": "user", "content": content})
 
-        # Trim history if needed
-        if len(self._history) > self._max_history:
-            self._history = self._history[-self._max_history :]
-
         # Build messages with system prompt
-        messages = [
-            {"role": "system", "content": self._system_prompt},
-        ]
+        messages = [self._system_message]
 
         # Inject context as a separate message before history if available
         if context_str:
@@ -212,41 +350,76 @@ class Coach:
                     "content": f"Here is the current game context:\n\n{context_str}",
                 }
             )
-            messages.append(
-                {
-                    "role": "assistant",
-                    "content": "Got it, I'll use this context to help answer your questions.",
-                }
-            )
+            messages.append(_CONTEXT_ACK)
 
         # Add conversation history
         messages.extend(self._history)
+        return messages, context_str is not None
 
-        # Get response from OpenAI (auto-instrumented by logfire.instrument_openai())
-        response = self._client.chat.completions.create(
-            model=self._model,
-            messages=messages,
-            max_completion_tokens=150,  # Keep responses very concise for speech
-        )
-
-        assistant_message = response.choices[0].message.content or ""
-
-        # Add assistant response to history
+    def _record_response(
+        self,
+        user_message: str,
+        screenshot: bytes | None,
+        assistant_message: str,
+        has_context: bool,
+        cache: bool = True,
+    ) -> None:
+        """Add the assistant turn to history and, if `cache`, the semantic cache."""
         self._history.append({"role": "assistant", "content": assistant_message})
-
-        # Store in cache for future queries (only text-only queries)
-        if not screenshot and self._cache and self._cache.enabled:
-            self._cache.store(user_message, assistant_message)
+        if cache:
+            self._cache_response(user_message, screenshot, assistant_message)
 
         logfire.info(
             "Coach response generated",
             response_length=len(assistant_message),
             history_length=len(self._history),
-            has_context=context_str is not None,
+            has_context=has_context,
         )
 
-        return assistant_message
+    def _cache_response(
+        self, user_message: str, screenshot: bytes | None, assistant_message: str
+    ) -> None:
+        """Store a response in the semantic cache for future queries (text-only queries)."""
+        if not screenshot and self._cache and self._cache.enabled:
+            ttl_seconds = _cache_ttl(user_message)
+            if ttl_seconds != _NO_CACHE:
+                self._cache.store(user_message, assistant_message, ttl_seconds=ttl_seconds)
+
+    def _image_data_url(self, screenshot: bytes) -> str:
+        """Encode a screenshot as a data URL, reusing the last one if unchanged.
+
+        Paused or static scenes produce identical frames, which then skip the
+        base64 encode (and its copy of the JPEG buffer).
+        """
+        digest = hashlib.blake2b(screenshot, digest_size=16).digest()
+        if self._last_image is None or self._last_image[0] != digest:
+            b64_image = base64.b64encode(screenshot).decode("utf-8")
+            self._last_image = (digest, f"data:image/jpeg;base64,{b64_image}")
+        return self._last_image[1]
+
+    def _strip_history_images(self) -> None:
+        """Replace multimodal user turns in history with their text part."""
+        for i, message in enumerate(self._history):
+            if isinstance(message["content"], list):
+                text = " ".join(
+                    part["text"] for part in message["content"] if part["type"] == "text"
+                )
+                self._history[i] = {"role": message["role"], "content": text}
 
     def clear_history(self) -> None:
         """Clear conversation history."""
-        self._history = []
+        self._history.clear()
+
+    async def aclose(self) -> None:
+        """Close the async clients used by stream_response."""
+        if self._context:
+            await self._context.aclose()
+        await self._async_client.close()
+
+
+def _cache_ttl(user_message: str) -> int | None:
+    """Semantic cache TTL for a prompt: _NO_CACHE, seconds, or None for the default."""
+    for pattern, ttl_seconds in _CACHE_TTL_RULES:
+        if pattern.search(user_message):
+            return ttl_seconds
+    return None
@@ -1,12 +1,19 @@
 """Context provider for enriching LLM queries with game state and NPC data."""
 
+import asyncio
+import base64
+import hashlib
 import os
+import threading
+from collections import OrderedDict
+from collections.abc import Coroutine
+from functools import cache
 
 import logfire
 import numpy as np
 import redis
-from openai import OpenAI
-from redis.commands.search.query import Query
+import redis.asyncio
+from openai import AsyncOpenAI
 
 from game_state_agent.models import GameState
 from game_state_agent.redis_store import GameStateStore
@@ -15,9 +22,56 @@ from game_state_agent.redis_store import GameStateStore
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 8))  # Per pool
 NPC_INDEX_NAME = "idx:npcs"
 EMBEDDING_MODEL = "text-embedding-3-small"
+# Must match the index TYPE built by redis_setup/setup_redis.py
+VECTOR_DTYPE = {"FLOAT32": np.float32, "FLOAT16": np.float16, "INT8": np.int8}[
+    os.getenv("NPC_VECTOR_TYPE", "FLOAT16").upper()
+]
 SIMILARITY_THRESHOLD = 0.3  # Minimum similarity score (1 - distance) to include results
+EMBEDDING_CACHE_SIZE = 512  # Query embeddings memoized per provider
+EMBEDDING_BATCH_WINDOW = 0.01  # Seconds concurrent queries wait to share a request
+EMBEDDING_BATCH_SIZE = 64  # Queries that trigger an immediate embeddings request
+MIN_QUERY_LENGTH = 4  # Shorter queries skip the NPC search entirely
+# Small talk that never retrieves useful NPCs, so it skips the embedding and search
+_STOP_PROMPTS = frozenset(
+    {
+        "hi",
+        "hey",
+        "hello",
+        "thanks",
+        "thank you",
+        "ok",
+        "okay",
+        "yes",
+        "no",
+        "cool",
+        "nice",
+        "got it",
+        "never mind",
+        "nevermind",
+    }
+)
+
+_embedding_lookups = logfire.metric_counter(
+    "context.embedding_cache_lookups", unit="1", description="Query embedding L1 cache lookups"
+)
+_embedding_hits = logfire.metric_counter(
+    "context.embedding_cache_hits", unit="1", description="Query embedding L1 cache hits"
+)
+
+# Shared by every provider so sockets are reused across voice turns
+# (replies are parsed by hiredis when it is installed). Decoding stays on:
+# searches never return the embedding field, so there are no vector blobs
+# to keep as bytes.
+_POOL = redis.ConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    password=REDIS_PASSWORD,
+    decode_responses=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+)
 
 
 class ContextProvider:
@@ -25,23 +79,38 @@ class ContextProvider:
 
     def __init__(
         self,
-        openai_client: OpenAI | None = None,
         redis_client: redis.Redis | None = None,
+        async_openai_client: AsyncOpenAI | None = None,
     ):
         """Initialize the context provider.
 
         Args:
-            openai_client: Optional OpenAI client for embeddings.
-            redis_client: Optional Redis client. Creates one from env vars if not provided.
+            redis_client: Optional Redis client. Uses the shared env-configured pool if not provided.
+            async_openai_client: Optional async OpenAI client for embeddings.
         """
-        self._openai = openai_client or OpenAI()
-        self._redis = redis_client or redis.Redis(
+        self._redis = redis_client or redis.Redis(connection_pool=_POOL)
+        # Async connections are bound to the loop they were opened on, so the
+        # async client has its own pool, used only on this provider's loop
+        # and closed by aclose. It connects on first use.
+        self._aredis = redis.asyncio.Redis(
             host=REDIS_HOST,
             port=REDIS_PORT,
             password=REDIS_PASSWORD,
             decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS,
         )
-        self._game_store = GameStateStore(client=self._redis)
+        self._game_store = GameStateStore(client=self._redis, async_client=self._aredis)
+        self._async_openai = async_openai_client or AsyncOpenAI()
+        self._embedding_batcher = _EmbeddingBatcher(self._async_openai)
+        # Every search runs on this provider's own event loop, so sync and async
+        # callers share the embedding batcher and the async clients are only
+        # ever used from the loop they connected on
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="context", daemon=True).start()
+        # L1 LRU of packed query vectors, so repeated questions skip the
+        # embeddings API call and any re-packing. Only touched on the loop
+        # thread above, so it needs no lock.
+        self._embedding_cache: OrderedDict[bytes, bytes] = OrderedDict()
 
     @logfire.instrument("get_game_state")
     def get_game_state(self) -> GameState | None:
@@ -56,14 +125,34 @@ class ContextProvider:
             logfire.warn("Failed to load game state from Redis", error=str(e))
             return None
 
-    @logfire.instrument("get_embedding")
-    def _get_embedding(self, text: str) -> list[float]:
-        """Get embedding for text using OpenAI API."""
-        response = self._openai.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=text,
-        )
-        return response.data[0].embedding
+    def _cached_embedding(self, key: bytes) -> bytes | None:
+        """Look up a query embedding in the L1 cache, marking it recently used."""
+        embedding = self._embedding_cache.get(key)
+        _embedding_lookups.add(1, {"layer": "embedding_lru"})
+        if embedding is not None:
+            self._embedding_cache.move_to_end(key)
+            _embedding_hits.add(1, {"layer": "embedding_lru"})
+        return embedding
+
+    def _cache_embedding(self, key: bytes, embedding: bytes) -> bytes:
+        """Pack a query embedding as VECTOR_DTYPE bytes and store it in the L1 cache.
+
+        Evicts the least recently used entry once the cache is full.
+
+        Args:
+            key: L1 cache key from _embedding_key.
+            embedding: Little-endian float32 bytes, as decoded from the API's base64.
+        """
+        # A view over the decoded bytes: no per-element Python floats
+        vector = np.frombuffer(embedding, dtype="<f4")
+        if VECTOR_DTYPE is np.int8:
+            # Same per-vector quantization as the indexed NPC embeddings
+            vector = np.round(vector * (127 / (np.abs(vector).max() or 1.0)))
+        vector = vector.astype(VECTOR_DTYPE).tobytes()
+        self._embedding_cache[key] = vector
+        if len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+            self._embedding_cache.popitem(last=False)
+        return vector
 
     @logfire.instrument("search_npcs")
     def search_npcs(self, query: str, top_k: int = 3) -> list[dict]:
@@ -74,47 +163,48 @@ class ContextProvider:
             top_k: Maximum number of results to return.
 
         Returns:
-            List of NPC dictionaries with relevant fields, filtered by similarity threshold.
+            List of NPC dictionaries with relevant fields, filtered by similarity threshold
+            in Redis.
         """
+        if not _worth_searching(query):
+            return []
+        return self._run(self._asearch_npcs(query, top_k))
+
+    def _run[T](self, coroutine: Coroutine[None, None, T]) -> T:
+        """Run a coroutine on the provider's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _aget_game_state(self) -> GameState | None:
+        """Async counterpart of get_game_state."""
         try:
-            query_embedding = np.array(self._get_embedding(query), dtype=np.float32)
-
-            search_query = (
-                Query(f"(*)=>[KNN {top_k} @embedding $query_vec AS score]")
-                .sort_by("score")
-                .return_fields(
-                    "score",
-                    "name",
-                    "race",
-                    "role",
-                    "region",
-                    "description",
-                    "how_to_beat_tips",
-                )
-                .dialect(2)
-            )
+            return await self._game_store.aload()
+        except Exception as e:
+            logfire.warn("Failed to load game state from Redis", error=str(e))
+            return None
 
-            results = self._redis.ft(NPC_INDEX_NAME).search(
-                search_query, {"query_vec": query_embedding.tobytes()}
-            )
+    async def _aget_embedding(self, text: str) -> bytes | None:
+        """Get the packed embedding for a query (memoized); None if the request fails."""
+        key = _embedding_key(text)
+        embedding = self._cached_embedding(key)
+        if embedding is not None:
+            return embedding
+        try:
+            # Concurrent turns arriving within EMBEDDING_BATCH_WINDOW share one request
+            embedding = await self._embedding_batcher.embed(text)
+        except Exception as e:
+            logfire.warn("Failed to embed NPC query", error=str(e))
+            return None
+        return self._cache_embedding(key, embedding)
 
-            npcs = []
-            for doc in results.docs:
-                # Score is distance, so similarity = 1 - score
-                similarity = 1 - float(doc.score)
-                if similarity >= SIMILARITY_THRESHOLD:
-                    npcs.append(
-                        {
-                            "name": doc.name,
-                            "race": doc.race,
-                            "role": doc.role,
-                            "region": doc.region,
-                            "description": getattr(doc, "description", ""),
-                            "tips": getattr(doc, "how_to_beat_tips", ""),
-                            "similarity": similarity,
-                        }
-                    )
+    async def _asearch_npcs(self, query: str, top_k: int) -> list[dict]:
+        """Embed a query and run the NPC vector search; [] on failure."""
+        embedding = await self._aget_embedding(query)
+        if embedding is None:
+            return []
 
+        try:
+            reply = await self._aredis.execute_command(*_npc_query(embedding, top_k))
+            npcs = _npc_results(reply)
             logfire.info(
                 "NPC search completed",
                 query_length=len(query),
@@ -141,64 +231,54 @@ class ContextProvider:
         Returns:
             Formatted context string, or None if no context is available.
         """
-        parts = []
+        # One flat line list joined once; sections are separated by a blank line
+        lines = []
 
         # Format game state
         if game_state:
-            state_lines = [
+            lines += [
                 "<game_state>",
                 f"Location: {game_state.player_location}",
                 f"Active Party: {', '.join(game_state.active_party)}",
             ]
 
             if game_state.current_boss:
-                state_lines.append(
+                lines.append(
                     f"Current Boss: {game_state.current_boss.name} "
                     f"(HP: {game_state.current_boss.hp_percentage:.0f}%)"
                 )
 
             if game_state.last_flag:
-                state_lines.append(f"Last Flag: {game_state.last_flag}")
+                lines.append(f"Last Flag: {game_state.last_flag}")
 
             if game_state.gradient_gauge > 0:
-                state_lines.append(f"Gradient Gauge: {game_state.gradient_gauge:.0f}%")
+                lines.append(f"Gradient Gauge: {game_state.gradient_gauge:.0f}%")
 
             if game_state.bosses_defeated:
-                state_lines.append(
-                    f"Bosses Defeated: {', '.join(game_state.bosses_defeated)}"
-                )
+                lines.append(f"Bosses Defeated: {', '.join(game_state.bosses_defeated)}")
 
             if game_state.at_camp:
-                state_lines.append("Status: At camp")
+                lines.append("Status: At camp")
 
-            state_lines.append("</game_state>")
-            parts.append("\n".join(state_lines))
+            lines.append("</game_state>")
 
         # Format NPC results
         if npc_results:
-            npc_lines = ["<relevant_npcs>"]
+            if lines:
+                lines.append("")
+            lines.append("<relevant_npcs>")
             for i, npc in enumerate(npc_results, 1):
-                npc_lines.append(
-                    f"{i}. {npc['name']} ({npc['role']}) - {npc['region']}"
-                )
+                lines.append(f"{i}. {npc['name']} ({npc['role']}) - {npc['region']}")
                 if npc["description"]:
-                    # Truncate long descriptions
-                    desc = npc["description"]
-                    if len(desc) > 200:
-                        desc = desc[:200] + "..."
-                    npc_lines.append(f"   {desc}")
+                    lines.append(f"   {_truncate(npc['description'])}")
                 if npc["tips"]:
-                    tips = npc["tips"]
-                    if len(tips) > 200:
-                        tips = tips[:200] + "..."
-                    npc_lines.append(f"   Tips: {tips}")
-            npc_lines.append("</relevant_npcs>")
-            parts.append("\n".join(npc_lines))
-
-        if not parts:
+                    lines.append(f"   Tips: {_truncate(npc['tips'])}")
+            lines.append("</relevant_npcs>")
+
+        if not lines:
             return None
 
-        return "\n\n".join(parts)
+        return "\n".join(lines)
 
     def get_context_for_query(self, query: str, top_k: int = 3) -> str | None:
         """Get formatted context for a user query.
@@ -213,6 +293,184 @@ class ContextProvider:
         Returns:
             Formatted context string, or None if no context is available.
         """
-        game_state = self.get_game_state()
-        npc_results = self.search_npcs(query, top_k=top_k)
+        return self._run(self._aget_context(query, top_k))
+
+    @logfire.instrument("aget_context_for_query")
+    async def aget_context_for_query(self, query: str, top_k: int = 3) -> str | None:
+        """Async version of get_context_for_query for event-loop callers.
+
+        Args:
+            query: The user's question.
+            top_k: Maximum number of NPC results.
+
+        Returns:
+            Formatted context string, or None if no context is available.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._aget_context(query, top_k), self._loop)
+        return await asyncio.wrap_future(future)
+
+    async def aclose(self) -> None:
+        """Close the async Redis connections and stop the provider's event loop."""
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._aredis.aclose(), self._loop))
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _aget_context(self, query: str, top_k: int) -> str | None:
+        """Fetch and format context on the provider's event loop.
+
+        The game state load runs concurrently with the query embedding
+        request and the NPC search that follows it.
+        """
+        if not _worth_searching(query):
+            return self.format_context(await self._aget_game_state(), [])
+
+        game_state, npc_results = await asyncio.gather(
+            self._aget_game_state(), self._asearch_npcs(query, top_k)
+        )
         return self.format_context(game_state, npc_results)
+
+
+class _EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into one API call.
+
+    Texts queue up for EMBEDDING_BATCH_WINDOW seconds (or until
+    EMBEDDING_BATCH_SIZE are waiting), then go out as a single embeddings
+    request whose results are handed back to each caller.
+    """
+
+    def __init__(self, client: AsyncOpenAI):
+        """Initialize the batcher.
+
+        Args:
+            client: Async OpenAI client used for the batched requests.
+        """
+        self._client = client
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._requests: set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> bytes:
+        """Embed one text as part of the next batch, as float32 bytes."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= EMBEDDING_BATCH_SIZE:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(EMBEDDING_BATCH_WINDOW, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Send every pending text in one request."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # Hold a reference so the request task isn't garbage collected mid-flight
+            task = asyncio.create_task(self._request(batch))
+            self._requests.add(task)
+            task.add_done_callback(self._requests.discard)
+
+    async def _request(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        """Embed a batch and resolve each caller's future."""
+        try:
+            with logfire.span("embedding_batch", batch_size=len(batch)):
+                response = await self._client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=[text for text, _ in batch],
+                    encoding_format="base64",
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for item in response.data:
+            if 0 <= item.index < len(batch):
+                future = batch[item.index][1]
+                if not future.done():
+                    future.set_result(base64.b64decode(item.embedding))
+        # A short or malformed response must not leave callers waiting forever
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(ValueError("Embeddings response is missing this input"))
+
+
+def _worth_searching(query: str) -> bool:
+    """Cheap check that a query could retrieve NPCs, before any network call."""
+    text = query.strip().lower().rstrip(".!?")
+    return len(text) >= MIN_QUERY_LENGTH and text not in _STOP_PROMPTS
+
+
+def _truncate(text: str, limit: int = 200) -> str:
+    """Cut text to `limit` characters, marking the cut with an ellipsis."""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _embedding_key(text: str) -> bytes:
+    """Fixed-size L1 cache key for a query text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _npc_query(query_embedding: bytes, top_k: int) -> tuple:
+    """Get the full FT.SEARCH command for an NPC vector range query."""
+    return (*_npc_search_command(top_k), query_embedding)
+
+
+@cache
+def _npc_search_command(top_k: int) -> tuple:
+    """Build the FT.SEARCH arguments once per top_k; only the query vector follows them.
+
+    Sent via execute_command, so no Query builder or Document objects are
+    created per search.
+    """
+    return (
+        "FT.SEARCH",
+        NPC_INDEX_NAME,
+        # Range query: Redis drops anything below SIMILARITY_THRESHOLD itself
+        "@embedding:[VECTOR_RANGE $radius $query_vec]=>{$YIELD_DISTANCE_AS: score}",
+        # Only what format_context uses, in the same reply (a NOCONTENT search
+        # plus follow-up HMGETs would add a round trip for top_k-sized results)
+        "RETURN",
+        6,
+        "score",
+        "name",
+        "role",
+        "region",
+        "description",
+        "how_to_beat_tips",
+        "SORTBY",
+        "score",
+        "LIMIT",
+        0,
+        top_k,
+        "DIALECT",
+        2,
+        # The query vector blob is appended as the last argument
+        "PARAMS",
+        4,
+        "radius",
+        1 - SIMILARITY_THRESHOLD,
+        "query_vec",
+    )
+
+
+def _npc_results(reply: list) -> list[dict]:
+    """Convert a raw FT.SEARCH reply into context dictionaries.
+
+    The reply is [total, key, [field, value, ...], key, [field, value, ...], ...];
+    below-threshold entries were already dropped by Redis.
+    """
+    rows = [dict(zip(fields[::2], fields[1::2])) for fields in reply[2::2]]
+    return [
+        {
+            "name": row["name"],
+            "role": row.get("role", ""),
+            "region": row.get("region", ""),
+            "description": row.get("description", ""),
+            "tips": row.get("how_to_beat_tips", ""),
+            # Score is distance, so similarity = 1 - score
+            "similarity": 1 - float(row["score"]),
+        }
+        for row in rows
+    ]
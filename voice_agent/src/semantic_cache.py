@@ -1,8 +1,37 @@
 """Semantic caching for LLM responses using LangCache."""
 
+import hashlib
+import json
+import math
 import os
+import time
+from collections import OrderedDict, deque
+from collections.abc import Iterable
 
 import logfire
+import numpy as np
+
+EXACT_CACHE_SIZE = 1024  # Byte-identical prompts answered without a LangCache call
+SCORE_HISTORY_SIZE = 1000  # Recent LangCache similarity scores kept for threshold tuning
+THRESHOLD_LOG_INTERVAL = 100  # Searches between recommended-threshold log lines
+LOCAL_EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Small CPU bi-encoder for the local layer
+LOCAL_CACHE_SIZE = 512  # Prompts matched locally before the LangCache call
+LOCAL_SIMILARITY_THRESHOLD = 0.92  # Cosine similarity for a local hit
+# LangCache doesn't report an entry's remaining TTL, so hits copied into the
+# in-process layers are only served from there for this long
+PROMOTED_HIT_TTL = 5 * 60
+
+# Per-layer hit rates and latencies, tagged layer=exact|local|langcache
+_lookups = logfire.metric_counter(
+    "semantic_cache.lookups", unit="1", description="Cache lookups by layer"
+)
+_hits = logfire.metric_counter("semantic_cache.hits", unit="1", description="Cache hits by layer")
+_latency = logfire.metric_histogram(
+    "semantic_cache.latency", unit="s", description="Cache lookup latency by layer and outcome"
+)
+_store_ttls = logfire.metric_histogram(
+    "semantic_cache.store_ttl", unit="s", description="TTL of responses stored with one"
+)
 
 
 class SemanticCache:
@@ -14,6 +43,7 @@ class SemanticCache:
         cache_id: str | None = None,
         api_key: str | None = None,
         similarity_threshold: float = 0.9,
+        warmup_path: str | None = None,
     ):
         """
         Initialize semantic cache.
@@ -23,13 +53,32 @@ class SemanticCache:
             cache_id: Cache ID. Falls back to LANGCACHE_CACHE_ID env var.
             api_key: LangCache API key. Falls back to LANGCACHE_API_KEY env var.
             similarity_threshold: Minimum similarity score to consider a cache hit (0.0-1.0).
+            warmup_path: JSONL of {"prompt", "response"} pairs stored at startup so
+                common questions hit from the first turn. Falls back to
+                LANGCACHE_WARMUP_PATH env var.
         """
         self._server_url = server_url or os.environ.get("LANGCACHE_SERVER_URL")
         self._cache_id = cache_id or os.environ.get("LANGCACHE_CACHE_ID")
         self._api_key = api_key or os.environ.get("LANGCACHE_API_KEY")
+        self._warmup_path = warmup_path or os.environ.get("LANGCACHE_WARMUP_PATH")
         self._similarity_threshold = similarity_threshold
         self._client = None
         self._enabled = False
+        # L0: exact prompt digest -> response, checked before the LangCache RPC
+        # (entries stored with a TTL carry their monotonic expiry time)
+        self._exact: OrderedDict[bytes, tuple[str, float]] = OrderedDict()
+        # Rolling window of best-match scores, hits and misses alike
+        self._score_hist: deque[float] = deque(maxlen=SCORE_HISTORY_SIZE)
+        self._searches = 0
+        # L1: local embeddings of recent prompts, a ring buffer filled on first
+        # use. The model is loaded lazily and needs sentence-transformers.
+        self._local_model = None
+        self._local_unavailable = False
+        self._local_vectors: np.ndarray | None = None
+        self._local_responses: list[str | None] = [None] * LOCAL_CACHE_SIZE
+        self._local_expiry = np.full(LOCAL_CACHE_SIZE, math.inf)
+        self._local_count = 0
+        self._local_next = 0
 
         if not all([self._server_url, self._cache_id, self._api_key]):
             logfire.warn(
@@ -53,11 +102,46 @@ class SemanticCache:
         except Exception as e:
             logfire.warn("Failed to initialize LangCache", error=str(e))
 
+        if self._enabled and self._warmup_path:
+            self.warm(_load_warmup(self._warmup_path))
+
     @property
     def enabled(self) -> bool:
         """Check if semantic caching is enabled."""
         return self._enabled
 
+    @property
+    def similarity_threshold(self) -> float:
+        """Minimum similarity score for a LangCache hit; can be changed at runtime."""
+        return self._similarity_threshold
+
+    @similarity_threshold.setter
+    def similarity_threshold(self, value: float) -> None:
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"similarity_threshold must be between 0 and 1, got {value}")
+        self._similarity_threshold = value
+
+    def recommend_threshold(self, target_precision: float = 0.95) -> float | None:
+        """
+        Suggest a similarity threshold from recently observed scores.
+
+        Cuts the score distribution at the `target_precision` percentile, so
+        only the closest (1 - target_precision) of matches would be served.
+        Lower it as answers are validated to trade precision for hit rate.
+
+        Args:
+            target_precision: Fraction of observed scores to fall below the cut (0.0-1.0).
+
+        Returns:
+            Recommended threshold, or None if no scores have been recorded yet.
+        """
+        if not 0.0 <= target_precision <= 1.0:
+            raise ValueError(f"target_precision must be between 0 and 1, got {target_precision}")
+        if not self._score_hist:
+            return None
+        scores = sorted(self._score_hist)
+        return scores[min(int(target_precision * len(scores)), len(scores) - 1)]
+
     @logfire.instrument("langcache.search")
     def search(self, prompt: str) -> str | None:
         """
@@ -72,17 +156,57 @@ class SemanticCache:
         if not self._enabled or not self._client:
             return None
 
+        key = _exact_key(prompt)
+        cached_response = self._exact_lookup(key)
+        _record_lookup("exact", cached_response is not None)
+        if cached_response is not None:
+            logfire.info(
+                "Cache hit",
+                prompt_length=len(prompt),
+                cache_layer="exact",
+                cache_hit=True,
+            )
+            return cached_response
+
+        # Local embedding check: no network round trip for close paraphrases
+        started = time.perf_counter()
+        vector = self._local_embed(prompt)
+        if vector is not None:
+            local_hit = self._local_lookup(vector)
+            _record_lookup("local", local_hit is not None, started)
+            if local_hit is not None:
+                cached_response, expires_at = local_hit
+                self._remember(key, cached_response, expires_at)
+                logfire.info(
+                    "Cache hit",
+                    prompt_length=len(prompt),
+                    cache_layer="local",
+                    cache_hit=True,
+                )
+                return cached_response
+
+        started = time.perf_counter()
         try:
             result = self._client.search(prompt=prompt)
+            if result:
+                self._record_score(result.get("score", 0))
             if result and result.get("score", 0) >= self._similarity_threshold:
                 cached_response = result.get("response")
+                _record_lookup("langcache", bool(cached_response), started)
                 logfire.info(
                     "Cache hit",
                     prompt_length=len(prompt),
                     similarity_score=result.get("score", 0),
+                    cache_layer="semantic",
                     cache_hit=True,
                 )
+                if cached_response:
+                    expires_at = time.monotonic() + PROMOTED_HIT_TTL
+                    self._remember(key, cached_response, expires_at)
+                    if vector is not None:
+                        self._local_store(vector, cached_response, expires_at)
                 return cached_response
+            _record_lookup("langcache", False, started)
             logfire.debug(
                 "Cache miss",
                 prompt_length=len(prompt),
@@ -90,17 +214,21 @@ class SemanticCache:
             )
             return None
         except Exception as e:
+            _record_lookup("langcache", False, started)
             logfire.warn("Cache search failed", error=str(e))
             return None
 
     @logfire.instrument("langcache.store")
-    def store(self, prompt: str, response: str) -> bool:
+    def store(self, prompt: str, response: str, ttl_seconds: int | None = None) -> bool:
         """
         Store a response in the cache.
 
         Args:
             prompt: The user prompt.
             response: The LLM response to cache.
+            ttl_seconds: How long the entry is served, by LangCache and the
+                in-process layers alike. Uses LangCache's default TTL (and no
+                in-process expiry) if None.
 
         Returns:
             True if stored successfully, False otherwise.
@@ -108,18 +236,131 @@ class SemanticCache:
         if not self._enabled or not self._client:
             return False
 
+        expires_at = math.inf if ttl_seconds is None else time.monotonic() + ttl_seconds
+        self._remember(_exact_key(prompt), response, expires_at)
+        vector = self._local_embed(prompt)
+        if vector is not None:
+            self._local_store(vector, response, expires_at)
         try:
-            self._client.set(prompt=prompt, response=response)
+            if ttl_seconds is None:
+                self._client.set(prompt=prompt, response=response)
+            else:
+                self._client.set(prompt=prompt, response=response, ttl_millis=ttl_seconds * 1000)
+                _store_ttls.record(ttl_seconds)
             logfire.debug(
                 "Cached response",
                 prompt_length=len(prompt),
                 response_length=len(response),
+                ttl_seconds=ttl_seconds,
             )
             return True
         except Exception as e:
             logfire.warn("Cache store failed", error=str(e))
             return False
 
+    @logfire.instrument("langcache.warm")
+    def warm(self, pairs: Iterable[tuple[str, str]]) -> int:
+        """
+        Seed the cache with known prompt/response pairs.
+
+        Args:
+            pairs: (prompt, response) pairs, e.g. common FAQ-style questions.
+
+        Returns:
+            Number of pairs stored successfully.
+        """
+        stored = sum(self.store(prompt, response) for prompt, response in pairs)
+        logfire.info("Semantic cache warmed", stored=stored)
+        return stored
+
+    def _record_score(self, score: float) -> None:
+        """Add a LangCache score to the histogram, periodically logging a recommendation."""
+        self._score_hist.append(score)
+        self._searches += 1
+        if self._searches % THRESHOLD_LOG_INTERVAL == 0:
+            logfire.info(
+                "Semantic cache threshold recommendation",
+                current_threshold=self._similarity_threshold,
+                recommended_threshold=self.recommend_threshold(),
+                samples=len(self._score_hist),
+            )
+
+    def _local_embed(self, prompt: str) -> np.ndarray | None:
+        """Embed a prompt with the local model, loading it on first use.
+
+        Returns None when the local layer is unavailable: sentence-transformers
+        is not installed, or the model failed to load or encode (which also
+        disables the layer for the rest of the session).
+        """
+        if self._local_unavailable:
+            return None
+        try:
+            if self._local_model is None:
+                from sentence_transformers import SentenceTransformer
+
+                self._local_model = SentenceTransformer(LOCAL_EMBEDDING_MODEL)
+                logfire.info("Local semantic cache layer enabled", model=LOCAL_EMBEDDING_MODEL)
+            vector = self._local_model.encode(
+                prompt, convert_to_numpy=True, normalize_embeddings=True
+            )
+        except ImportError:
+            self._local_unavailable = True
+            logfire.info("sentence-transformers not installed. Local cache layer disabled.")
+            return None
+        except Exception as e:
+            self._local_unavailable = True
+            self._local_model = None
+            logfire.warn("Local cache layer failed, disabling it", error=str(e))
+            return None
+        return vector.astype(np.float32, copy=False)
+
+    def _local_lookup(self, vector: np.ndarray) -> tuple[str, float] | None:
+        """Find the most similar unexpired locally cached prompt.
+
+        Returns:
+            (response, expiry time) of the match, or None.
+        """
+        if self._local_count == 0:
+            return None
+        # Vectors are normalised, so one matrix-vector product gives cosines
+        similarities = self._local_vectors[: self._local_count] @ vector
+        similarities[self._local_expiry[: self._local_count] <= time.monotonic()] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < LOCAL_SIMILARITY_THRESHOLD:
+            return None
+        return self._local_responses[best], float(self._local_expiry[best])
+
+    def _local_store(
+        self, vector: np.ndarray, response: str, expires_at: float = math.inf
+    ) -> None:
+        """Add a prompt embedding to the local layer, overwriting the oldest if full."""
+        if self._local_vectors is None:
+            self._local_vectors = np.empty((LOCAL_CACHE_SIZE, vector.shape[0]), dtype=np.float32)
+        self._local_vectors[self._local_next] = vector
+        self._local_responses[self._local_next] = response
+        self._local_expiry[self._local_next] = expires_at
+        self._local_next = (self._local_next + 1) % LOCAL_CACHE_SIZE
+        self._local_count = min(self._local_count + 1, LOCAL_CACHE_SIZE)
+
+    def _exact_lookup(self, key: bytes) -> str | None:
+        """Look up an unexpired exact-match response, marking it recently used."""
+        entry = self._exact.get(key)
+        if entry is None:
+            return None
+        response, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._exact[key]
+            return None
+        self._exact.move_to_end(key)
+        return response
+
+    def _remember(self, key: bytes, response: str, expires_at: float = math.inf) -> None:
+        """Add a response to the exact-match cache, evicting the oldest if full."""
+        self._exact[key] = (response, expires_at)
+        self._exact.move_to_end(key)
+        if len(self._exact) > EXACT_CACHE_SIZE:
+            self._exact.popitem(last=False)
+
     def __enter__(self):
         """Context manager entry."""
         return self
@@ -127,3 +368,31 @@ class SemanticCache:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit - cleanup if needed."""
         pass
+
+
+def _record_lookup(layer: str, hit: bool, started: float | None = None) -> None:
+    """Count a lookup for a cache layer, and its latency if `started` is given."""
+    attributes = {"layer": layer}
+    _lookups.add(1, attributes)
+    if hit:
+        _hits.add(1, attributes)
+    if started is not None:
+        _latency.record(
+            time.perf_counter() - started, {**attributes, "outcome": "hit" if hit else "miss"}
+        )
+
+
+def _exact_key(prompt: str) -> bytes:
+    """Digest identifying a byte-identical prompt."""
+    return hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
+
+
+def _load_warmup(path: str) -> list[tuple[str, str]]:
+    """Read (prompt, response) pairs from a JSONL file; empty if unreadable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        return [(row["prompt"], row["response"]) for row in rows]
+    except (OSError, ValueError, KeyError) as e:
+        logfire.warn("Failed to load semantic cache warmup file", path=path, error=str(e))
+        return []
@@ -1,22 +1,35 @@
 """Speech-to-Text using ElevenLabs Scribe."""
 
+import asyncio
+import base64
+import json
 import os
-import io
+from collections.abc import AsyncIterable, AsyncIterator
 
 import logfire
 from elevenlabs import ElevenLabs
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+REALTIME_URL = "wss://api.elevenlabs.io/v1/speech-to-text/realtime"
 
 
 class SpeechToText:
     """Transcribes audio using ElevenLabs Scribe."""
 
-    def __init__(self, api_key: str | None = None, model_id: str = "scribe_v1"):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model_id: str = "scribe_v1",
+        realtime_model_id: str = "scribe_v2_realtime",
+    ):
         """
         Initialize the STT client.
 
         Args:
             api_key: ElevenLabs API key. Falls back to ELEVENLABS_API_KEY env var.
             model_id: The model to use for transcription.
+            realtime_model_id: The model to use for streaming transcription.
         """
         self._api_key = api_key or os.environ.get("ELEVENLABS_API_KEY")
         if not self._api_key:
@@ -25,6 +38,7 @@ class SpeechToText:
             )
         self._client = ElevenLabs(api_key=self._api_key)
         self._model_id = model_id
+        self._realtime_model_id = realtime_model_id
 
     @logfire.instrument("elevenlabs.stt")
     def transcribe(self, audio_bytes: bytes) -> str:
@@ -46,12 +60,10 @@ class SpeechToText:
             model_id=self._model_id,
         )
 
-        # Create a file-like object from bytes
-        audio_file = io.BytesIO(audio_bytes)
-        audio_file.name = "audio.wav"  # ElevenLabs needs a filename
-
+        # (filename, content, content type) multipart tuple: the SDK sends the
+        # bytes as-is, without copying them into a BytesIO first
         result = self._client.speech_to_text.convert(
-            file=audio_file,
+            file=("audio.wav", audio_bytes, "audio/wav"),
             model_id=self._model_id,
         )
 
@@ -61,3 +73,98 @@ class SpeechToText:
         )
 
         return result.text
+
+    async def atranscribe_stream(
+        self,
+        frames: AsyncIterable[bytes],
+        sample_rate: int = 16000,
+    ) -> AsyncIterator[str]:
+        """
+        Transcribe audio while it is still being recorded.
+
+        Frames are sent over the realtime WebSocket as they arrive, so the
+        upload overlaps transcription instead of waiting for the full clip.
+        Not used by the push-to-talk loop yet, which records the whole clip
+        and calls `transcribe`; this is the entry point for a streaming
+        recorder.
+
+        Args:
+            frames: Raw 16-bit mono PCM chunks (100-200ms each works well).
+            sample_rate: Sample rate of the PCM frames in Hz.
+
+        Yields:
+            Partial transcripts as they update; the last one is the final text.
+
+        Raises:
+            RuntimeError: If the service reports an error or closes the stream
+                without a committed transcript.
+            Exception: Whatever the frame iterator or a send raised.
+        """
+        url = (
+            f"{REALTIME_URL}?model_id={self._realtime_model_id}"
+            f"&audio_format=pcm_{sample_rate}&commit_strategy=manual"
+        )
+        # No span here: it would stay open across yields to the consumer
+        logfire.info("Starting streaming transcription", model_id=self._realtime_model_id)
+
+        async with connect(url, additional_headers={"xi-api-key": self._api_key}) as ws:
+
+            async def send_audio() -> None:
+                try:
+                    async for frame in frames:
+                        await ws.send(_audio_chunk(frame, sample_rate, commit=False))
+                    # End of utterance: ask for the committed transcript
+                    await ws.send(_audio_chunk(b"", sample_rate, commit=True))
+                except Exception:
+                    # Ends the receive loop below, which re-raises this error
+                    await ws.close()
+                    raise
+
+            sender = asyncio.create_task(send_audio())
+            try:
+                try:
+                    async for raw in ws:
+                        message = json.loads(raw)
+                        message_type = message.get("message_type", "")
+                        if message_type == "partial_transcript":
+                            yield message.get("text", "")
+                        elif message_type == "committed_transcript":
+                            logfire.info(
+                                "Transcription completed",
+                                transcript_length=len(message.get("text", "")),
+                            )
+                            yield message.get("text", "")
+                            return
+                        elif "error" in message_type:
+                            raise RuntimeError(f"Streaming transcription failed: {message}")
+                    closed_error = None
+                except ConnectionClosed as e:
+                    closed_error = e
+
+                # The socket closed before a committed transcript. If the
+                # sender closed it, let it finish so its error is the one raised
+                await asyncio.wait([sender], timeout=1.0)
+                if _failed(sender):
+                    raise sender.exception()
+                if closed_error is not None:
+                    raise closed_error
+                raise RuntimeError("Streaming transcription closed without a committed transcript")
+            finally:
+                sender.cancel()
+
+
+def _failed(task: asyncio.Task) -> bool:
+    """Whether a task has finished with an exception."""
+    return task.done() and not task.cancelled() and task.exception() is not None
+
+
+def _audio_chunk(frame: bytes, sample_rate: int, commit: bool) -> str:
+    """Encode a PCM frame as a realtime STT message."""
+    return json.dumps(
+        {
+            "message_type": "input_audio_chunk",
+            "audio_base_64": base64.b64encode(frame).decode("ascii"),
+            "commit": commit,
+            "sample_rate": sample_rate,
+        }
+    )